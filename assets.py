@@ -0,0 +1,115 @@
+import hashlib
+import os
+import resource
+import time
+
+import numpy as np
+import pygame
+
+DEFAULT_CACHE_DIR = '.asset_cache'
+
+
+def resident_memory_mb():
+    # Current RSS from /proc where available, otherwise the peak from getrusage
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_placeholder(label, size):
+    placeholder = pygame.Surface(size)
+    placeholder.fill((128, 128, 128))  # Fill with gray color
+    font = pygame.font.Font(None, 24)
+    text = font.render(label, True, (255, 255, 255))
+    placeholder.blit(text, (10, size[1] // 2 - 12))
+    return placeholder
+
+
+class AssetManager:
+    """Images by name, loaded on first request and scaled to one fixed size.
+
+    Names that resolve to the same file content share one surface. Decoded, pre-scaled
+    RGBA pixels are written to cache_dir and memory-mapped on later runs, so a warm start
+    never decodes a PNG. Missing files get a labelled gray placeholder.
+    """
+
+    def __init__(self, sources, size, cache_dir=DEFAULT_CACHE_DIR):
+        self.sources = dict(sources)
+        self.size = tuple(size)
+        self.cache_dir = cache_dir
+        self.loaded = {}
+        self.by_content = {}
+        self.content_hashes = {}
+        self.stats = {'decoded': 0, 'from_disk_cache': 0, 'deduplicated': 0, 'placeholders': 0,
+                      'load_seconds': 0.0}
+
+    def __getitem__(self, name):
+        surface = self.loaded.get(name)
+        if surface is None:
+            if name not in self.sources:
+                raise KeyError(name)
+            start = time.perf_counter()
+            surface = self.loaded[name] = self._load(name, self.sources[name])
+            self.stats['load_seconds'] += time.perf_counter() - start
+        return surface
+
+    def __contains__(self, name):
+        return name in self.sources
+
+    def keys(self):
+        return self.sources.keys()
+
+    def preload(self):
+        for name in self.sources:
+            self[name]
+
+    def _content_hash(self, path):
+        digest = self.content_hashes.get(path)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = self.content_hashes[path] = hashlib.sha1(f.read()).hexdigest()
+        return digest
+
+    def _load(self, name, path):
+        if not os.path.exists(path):
+            print(f"File '{path}' not found. Creating a placeholder image.")
+            self.stats['placeholders'] += 1
+            return make_placeholder(name, self.size)
+
+        key = (self._content_hash(path), self.size)
+        surface = self.by_content.get(key)
+        if surface is not None:
+            self.stats['deduplicated'] += 1
+            return surface
+
+        width, height = self.size
+        cache_path = os.path.join(self.cache_dir, f"{key[0]}_{width}x{height}.rgba")
+        if os.path.exists(cache_path) and os.path.getsize(cache_path) == width * height * 4:
+            pixels = np.memmap(cache_path, dtype=np.uint8, mode='r')
+            surface = pygame.image.frombuffer(pixels, self.size, 'RGBA').convert_alpha()
+            del pixels
+            self.stats['from_disk_cache'] += 1
+        else:
+            surface = pygame.transform.scale(pygame.image.load(path), self.size).convert_alpha()
+            self._write_cache(cache_path, pygame.image.tobytes(surface, 'RGBA'))
+            self.stats['decoded'] += 1
+
+        self.by_content[key] = surface
+        return surface
+
+    def _write_cache(self, cache_path, data):
+        # Write then rename so parallel render workers never read a half-written file
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(data)
+        os.replace(temporary_path, cache_path)
+
+    def describe(self):
+        stats = self.stats
+        return (f"Assets: {len(self.loaded)} loaded in {stats['load_seconds'] * 1000:.1f} ms "
+                f"({stats['decoded']} decoded, {stats['from_disk_cache']} from disk cache, "
+                f"{stats['deduplicated']} deduplicated, {stats['placeholders']} placeholders), "
+                f"RSS {resident_memory_mb():.1f} MB")
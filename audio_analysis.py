@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import time
+import wave
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+import pygame
+
+CUES_VERSION = 1
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+CHUNK_SAMPLES = 1 << 16  # samples decoded and analysed at a time, about 1.5 s at 44.1 kHz
+HASH_BLOCK = 1 << 20
+
+
+def cue_path_for(audio_path):
+    return os.path.splitext(audio_path)[0] + '.cues.json'
+
+
+def file_hash(path):
+    # Read in blocks so hour-long mixes are hashed without holding the file in memory
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def to_mono(samples, bit_size):
+    # Integer PCM (frames x channels) to mono floats in -1..1
+    samples = samples.astype(np.float32)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    return samples / float(2 ** (abs(bit_size) - 1))
+
+
+def decode_wave(audio_path, chunk_samples):
+    # The stdlib reads WAV files a block at a time, no decoder needed
+    with wave.open(audio_path, 'rb') as f:
+        channels, width, sample_rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        yield sample_rate
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+        while True:
+            data = f.readframes(chunk_samples)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype=dtype).reshape(-1, channels)
+            if width == 1:
+                samples = samples.astype(np.int16) - 128
+            yield to_mono(samples, 8 * width)
+
+
+def decode_ffmpeg(audio_path, chunk_samples, sample_rate, channels=2):
+    # Raw PCM from an ffmpeg pipe, read into one reused buffer
+    process = subprocess.Popen(['ffmpeg', '-v', 'error', '-i', audio_path, '-f', 's16le', '-ac', str(channels),
+                                '-ar', str(sample_rate), '-'], stdout=subprocess.PIPE)
+    yield sample_rate
+    buffer = np.empty((chunk_samples, channels), dtype=np.int16)
+    view = memoryview(buffer).cast('B')
+    try:
+        while True:
+            # A pipe can hand over less than asked for; only a short final chunk ends the stream
+            filled = 0
+            while filled < len(view):
+                read = process.stdout.readinto(view[filled:])
+                if not read:
+                    break
+                filled += read
+            if filled:
+                yield to_mono(buffer[:filled // (2 * channels)], 16)
+            if filled < len(view):
+                break
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def decode_sdl(audio_path, chunk_samples):
+    # SDL_mixer decodes the whole file into the mixer's format; it is only converted to floats a
+    # chunk at a time
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    sample_rate, bit_size, _ = pygame.mixer.get_init()
+    yield sample_rate
+    samples = pygame.sndarray.samples(pygame.mixer.Sound(audio_path))
+    for start in range(0, len(samples), chunk_samples):
+        yield to_mono(samples[start:start + chunk_samples], bit_size)
+
+
+def decode_chunks(audio_path, chunk_samples=CHUNK_SAMPLES):
+    """Mono float samples of a track in chunks; the first item yielded is the sample rate.
+
+    WAV files are read with the stdlib and anything else is piped through ffmpeg when it is on
+    PATH, so memory does not grow with the track's length. Without ffmpeg SDL_mixer decodes
+    the whole track as before.
+    """
+    if audio_path.lower().endswith(('.wav', '.wave')):
+        return decode_wave(audio_path, chunk_samples)
+    if shutil.which('ffmpeg'):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        return decode_ffmpeg(audio_path, chunk_samples, pygame.mixer.get_init()[0])
+    return decode_sdl(audio_path, chunk_samples)
+
+
+def frame_signal(samples, frame_size=FRAME_SIZE, hop_size=HOP_SIZE):
+    if len(samples) < frame_size:
+        samples = np.pad(samples, (0, frame_size - len(samples)))
+    return np.lib.stride_tricks.sliding_window_view(samples, frame_size)[::hop_size]
+
+
+def chunk_frames(chunks, frame_size=FRAME_SIZE, hop_size=HOP_SIZE):
+    # Blocks of analysis frames, the same frames frame_signal cuts from the whole signal; only
+    # the samples of the frame straddling two chunks are carried over
+    pending = np.zeros(0, dtype=np.float32)
+    framed = False
+    for chunk in chunks:
+        pending = np.concatenate([pending, chunk])
+        if len(pending) >= frame_size:
+            count = (len(pending) - frame_size) // hop_size + 1
+            yield frame_signal(pending[:(count - 1) * hop_size + frame_size], frame_size, hop_size)
+            pending = pending[count * hop_size:]
+            framed = True
+    if not framed:
+        yield frame_signal(pending, frame_size, hop_size)
+
+
+def log_spectrum(frames):
+    return np.log1p(np.abs(np.fft.rfft(frames * np.hanning(frames.shape[1]), axis=1)))
+
+
+def pick_onsets(flux, frame_rate, window_seconds=0.1, delta=0.05, min_gap_seconds=0.08):
+    # Local maxima standing above a moving-average threshold, at least min_gap apart
+    window = max(1, int(window_seconds * frame_rate))
+    kernel = np.ones(2 * window + 1) / (2 * window + 1)
+    threshold = np.convolve(flux, kernel, mode='same') + delta
+    peaks = np.flatnonzero((flux[1:-1] > flux[:-2]) & (flux[1:-1] >= flux[2:]) & (flux[1:-1] > threshold[1:-1])) + 1
+
+    onsets = []
+    min_gap = min_gap_seconds * frame_rate
+    for peak in peaks:
+        if not onsets or peak - onsets[-1] >= min_gap:
+            onsets.append(peak)
+        elif flux[peak] > flux[onsets[-1]]:
+            onsets[-1] = peak
+    return np.array(onsets, dtype=np.intp)
+
+
+def estimate_beats(flux, frame_rate, min_bpm=60, max_bpm=200):
+    # Tempo from the autocorrelation peak of the onset envelope, phase from the best-aligned grid
+    envelope = flux - flux.mean()
+    shortest = max(1, int(frame_rate * 60 / max_bpm))
+    longest = min(len(envelope) - 1, int(frame_rate * 60 / min_bpm))
+    if longest <= shortest:
+        return 0.0, np.array([])
+    # Only the lags of plausible tempos, rather than the full O(n^2) correlation
+    autocorrelation = [np.dot(envelope[lag:], envelope[:len(envelope) - lag]) for lag in range(shortest, longest + 1)]
+    period = shortest + int(np.argmax(autocorrelation))
+    phases = [flux[phase::period].sum() for phase in range(period)]
+    phase = int(np.argmax(phases))
+    beats = np.arange(phase, len(flux), period)
+    return 60 * frame_rate / period, beats
+
+
+def analyze(audio_path, chunk_samples=CHUNK_SAMPLES, audio_hash=None):
+    # Decoded and analysed a chunk at a time; only the per-frame envelopes (86 values per
+    # second) are kept for the whole track
+    start = time.perf_counter()
+    samples = 0
+
+    def counted(chunks):
+        nonlocal samples
+        for chunk in chunks:
+            samples += len(chunk)
+            yield chunk
+
+    chunks = decode_chunks(audio_path, chunk_samples)
+    sample_rate = next(chunks)
+    frame_rate = sample_rate / HOP_SIZE
+    rms_blocks, flux_blocks = [], [np.zeros(1)]
+    previous = None
+    for frames in chunk_frames(counted(chunks)):
+        rms_blocks.append(np.sqrt(np.mean(frames ** 2, axis=1)))
+        spectrum = log_spectrum(frames)
+        if previous is not None:
+            spectrum = np.concatenate([previous, spectrum])
+        # Only rising energy marks an onset
+        flux_blocks.append(np.maximum(np.diff(spectrum, axis=0), 0).sum(axis=1))
+        previous = spectrum[-1:]
+    rms = np.concatenate(rms_blocks)
+    flux = np.concatenate(flux_blocks)
+    flux = flux / (flux.max() or 1.0)
+
+    onsets = pick_onsets(flux, frame_rate)
+    tempo, beats = estimate_beats(flux, frame_rate)
+
+    return {
+        'version': CUES_VERSION,
+        'audio_hash': audio_hash or file_hash(audio_path),
+        'duration': samples / sample_rate,
+        'frame_rate': frame_rate,
+        'tempo': tempo,
+        'onsets': [round(float(frame / frame_rate), 4) for frame in onsets],
+        'beats': [round(float(frame / frame_rate), 4) for frame in beats],
+        'rms': [round(float(value), 5) for value in rms / (rms.max() or 1.0)],
+        'analysis_seconds': time.perf_counter() - start,
+    }
+
+
+def load_cues(audio_path, cue_path=None, audio_hash=None):
+    """Cues for an audio file, read from its cue file or analysed and saved on first use."""
+    cue_path = cue_path or cue_path_for(audio_path)
+    audio_hash = audio_hash or file_hash(audio_path)
+    if os.path.exists(cue_path):
+        with open(cue_path) as f:
+            data = json.load(f)
+        if data.get('version') == CUES_VERSION and data.get('audio_hash') == audio_hash:
+            return Cues(data)
+
+    data = analyze(audio_path, audio_hash=audio_hash)
+    with open(cue_path, 'w') as f:
+        json.dump(data, f)
+    print(f"Analysed '{audio_path}' ({data['duration']:.1f}s) in {data['analysis_seconds']:.2f}s: "
+          f"{len(data['onsets'])} onsets, {data['tempo']:.1f} BPM -> {cue_path}")
+    return Cues(data)
+
+
+class Cues:
+    """Onset/beat times and a normalised RMS energy envelope for one track."""
+
+    def __init__(self, data):
+        self.onsets = data['onsets']
+        self.beats = data['beats']
+        self.tempo = data['tempo']
+        self.duration = data['duration']
+        self.frame_rate = data['frame_rate']
+        self.rms = np.array(data['rms'], dtype=np.float32)
+        self.rms_values = array('d', self.rms)  # 8 bytes a value instead of a list of float objects
+
+    def intensity_at(self, current_time):
+        # Normalised energy 0..1 at a time, linearly interpolated between analysis frames the
+        # way np.interp does, without building an index array the length of the track per call
+        rms = self.rms_values
+        if not rms:
+            return 0.5
+        position = current_time * self.frame_rate
+        if position <= 0:
+            return rms[0]
+        if position >= len(rms) - 1:
+            return rms[-1]
+        index = int(position)
+        if index == position:
+            return rms[index]
+        return (rms[index + 1] - rms[index]) * (position - index) + rms[index]
+
+    def nearest(self, times, current_time, window):
+        index = bisect_left(times, current_time)
+        candidates = [times[i] for i in (index - 1, index) if 0 <= i < len(times)]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda t: abs(t - current_time))
+        return best if abs(best - current_time) <= window else None
+
+    def snap(self, current_time, window=0.25):
+        # Move a lyric start onto the closest onset within window seconds, if there is one
+        onset = self.nearest(self.onsets, current_time, window)
+        return current_time if onset is None else onset
+
+    def snap_lyrics(self, timed_lyrics, window=0.25):
+        return [(self.snap(lyric_time, window), text) for lyric_time, text in timed_lyrics]
@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pygame
+
+
+class AudioClock:
+    """Render clock slaved to the music position reported by pygame.mixer.music.get_pos().
+
+    get_pos() jitters with the audio buffer size, so the clock runs on the wall clock and
+    is pulled towards the audio position a little every frame (gain), snapping straight to
+    it after a seek or stall (resync_threshold seconds). The audio device rarely runs at
+    exactly wall-clock speed, so the rate is tracked too (rate_gain) to remove the steady
+    lag a purely proportional correction leaves. It never runs backwards between seeks.
+    latency is added to aim frames at when they will actually be seen.
+    """
+
+    def __init__(self, gain=0.1, rate_gain=0.05, resync_threshold=0.1, latency=0.0, clock=time.perf_counter):
+        self.gain = gain
+        self.rate_gain = rate_gain
+        self.rate = 1.0
+        self.resync_threshold = resync_threshold
+        self.latency = latency
+        self.clock = clock
+        self.start_offset = 0.0
+        self.anchor_time = 0.0
+        self.anchor_wall = clock()
+        self.last_time = 0.0
+        self.drift = DriftReport()
+
+    def audio_time(self):
+        position = pygame.mixer.music.get_pos()
+        if position < 0:
+            return None
+        # get_pos() counts from the last play(), not from the start of the track
+        return self.start_offset + position / 1000
+
+    def time(self):
+        now = self.clock()
+        predicted = self.anchor_time + (now - self.anchor_wall) * self.rate
+        audio = self.audio_time()
+        if audio is not None:
+            error = audio - predicted
+            if abs(error) > self.resync_threshold:
+                predicted = audio
+            else:
+                predicted += error * self.gain
+                self.rate = min(1.1, max(0.9, self.rate + error * self.rate_gain))
+            self.anchor_time, self.anchor_wall = predicted, now
+            self.drift.record(predicted - audio)
+
+        predicted = max(predicted, self.last_time)
+        self.last_time = predicted
+        return predicted + self.latency
+
+    def seek(self, position):
+        pygame.mixer.music.play(start=position)
+        self.start_offset = position
+        self.anchor_time = self.last_time = position
+        self.anchor_wall = self.clock()
+
+    def scrub(self, delta, duration=None):
+        # Seek relative to the position on screen, kept within the track
+        position = max(0.0, self.last_time + delta)
+        self.seek(position if duration is None else min(position, duration))
+
+
+class DriftReport:
+    """Per-frame offset between the visual clock and the audio position, in milliseconds."""
+
+    def __init__(self):
+        self.offsets_ms = []
+
+    def record(self, offset_seconds):
+        self.offsets_ms.append(offset_seconds * 1000)
+
+    def percentiles(self):
+        if not self.offsets_ms:
+            return None
+        offsets = np.abs(np.array(self.offsets_ms))
+        return {
+            'p50': float(np.percentile(offsets, 50)),
+            'p99': float(np.percentile(offsets, 99)),
+            'max': float(offsets.max()),
+        }
+
+    def histogram(self, bin_ms=1.0, limit_ms=20.0):
+        # Offsets beyond +-limit_ms are counted in the outermost bins
+        offsets = np.clip(np.array(self.offsets_ms), -limit_ms, limit_ms)
+        edges = np.arange(-limit_ms, limit_ms + bin_ms, bin_ms)
+        counts, edges = np.histogram(offsets, bins=edges)
+        return counts, edges
+
+    def describe(self, fps=60, histogram=False):
+        stats = self.percentiles()
+        if stats is None:
+            return "Drift: no audio position samples"
+        frame_ms = 1000 / fps
+        within = np.mean(np.abs(np.array(self.offsets_ms)) <= frame_ms)
+        lines = [f"Drift over {len(self.offsets_ms)} frames: p50 {stats['p50']:.2f} ms, "
+                 f"p99 {stats['p99']:.2f} ms, max {stats['max']:.2f} ms, "
+                 f"{within:.1%} within one frame ({frame_ms:.1f} ms)"]
+        if histogram:
+            counts, edges = self.histogram()
+            peak = max(counts.max(), 1)
+            for count, low in zip(counts, edges):
+                if count:
+                    lines.append(f"{low:+6.1f} ms {'#' * max(1, int(40 * count / peak))} {count}")
+        return '\n'.join(lines)
@@ -0,0 +1,300 @@
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import offline_render
+
+offline_render.use_headless_drivers()
+
+import mutagen
+
+from audio_analysis import file_hash
+from lyric_timings import read_timings
+from render_cache import scene_fingerprint
+from render_profiles import draw_size, resolve_profile
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+THEMES = {
+    'neon': 'lyrics.py',
+    'aggressive': 'lyrics copy.py',
+}
+JOB_DEFAULTS = {
+    'theme': 'neon',
+    'resolution': None,  # a render profile name or "WIDTHxHEIGHT"; None is the theme's own size
+    'fps': 30,
+    'duration': None,  # the whole song
+    'image_format': 'png',
+    'segment_seconds': 10.0,
+    'audio_in_output': True,
+}
+
+# Theme modules loaded in this process, reused by every job it runs so fonts, text and sprite
+# caches and decoded images carry over from one song to the next
+loaded_themes = {}
+
+
+def parse_resolution(value):
+    return None if value is None else resolve_profile(value)
+
+
+def load_manifest(path):
+    """Jobs from a manifest, with defaults applied and paths made absolute.
+
+    The manifest is JSON: {"defaults": {...}, "jobs": [{"name", "audio", "output", "lyrics",
+    "theme", "resolution", "fps", "duration", ...}]}. Relative paths are relative to it.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = dict(JOB_DEFAULTS, **manifest.get('defaults', {}))
+
+    jobs = []
+    names = set()
+    for entry in manifest['jobs']:
+        job = dict(defaults, **entry)
+        for key in ('audio', 'output'):
+            if key not in job:
+                raise ValueError(f"Manifest job {entry} has no '{key}'")
+        job.setdefault('name', os.path.splitext(os.path.basename(job['audio']))[0])
+        if job['name'] in names:
+            raise ValueError(f"Manifest has two jobs named '{job['name']}'")
+        names.add(job['name'])
+        for key in ('audio', 'output', 'lyrics'):
+            if job.get(key):
+                job[key] = os.path.join(base, job[key])
+        job['resolution'] = parse_resolution(job['resolution'])
+        jobs.append(job)
+    return jobs
+
+
+def theme_script(theme):
+    return os.path.join(SCRIPT_DIR, THEMES.get(theme, theme))
+
+
+def load_theme(theme):
+    module = loaded_themes.get(theme)
+    if module is None:
+        module = offline_render.load_script(theme_script(theme), f"theme_{len(loaded_themes)}")
+        loaded_themes[theme] = module
+    return module
+
+
+def estimate_cost(job):
+    # Pixels to render: longest jobs go first so the pool does not end on one straggler
+    duration = mutagen.File(job['audio']).info.length
+    if job['duration'] is not None:
+        duration = min(duration, job['duration'])
+    width, height = draw_size(job['resolution']) if job['resolution'] else load_theme(job['theme']).DESIGN_SIZE
+    return duration * job['fps'] * width * height
+
+
+def job_fingerprint(job, module):
+    # Anything that changes the pixels or the song invalidates a checkpoint: the settings, the
+    # song and lyric files, and the theme's code (with its own lyrics, which jobs without a
+    # lyrics file use), every local module it imports and the files it draws from
+    settings = {key: value for key, value in job.items() if key != 'name'}
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    digest.update(file_hash(job['audio']).encode('ascii'))
+    if job.get('lyrics'):
+        digest.update(file_hash(job['lyrics']).encode('ascii'))
+    digest.update(scene_fingerprint(module, getattr(module, 'SCENE_FILES', ()), masked=()).encode('ascii'))
+    return digest.hexdigest()
+
+
+class Checkpoint:
+    """Which segments of a job are already on disk, saved after each one so a batch can resume."""
+
+    def __init__(self, job, module):
+        self.path = job['output'].rstrip('/\\') + '.checkpoint.json'
+        self.fingerprint = job_fingerprint(job, module)
+        self.segments = set()
+        self.complete = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get('fingerprint') == self.fingerprint:
+                self.segments = set(data['segments'])
+                self.complete = data['complete']
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'fingerprint': self.fingerprint, 'segments': sorted(self.segments),
+                       'complete': self.complete}, f)
+        # Replace in one step so an interrupted batch never leaves a half-written checkpoint
+        os.replace(temporary, self.path)
+
+    def mark(self, segment):
+        self.segments.add(segment)
+        self.save()
+
+    def finish(self):
+        self.complete = True
+        self.save()
+
+
+def render_job(job):
+    start = time.perf_counter()
+    module = load_theme(job['theme'])
+    checkpoint = Checkpoint(job, module)
+    if checkpoint.complete and os.path.exists(job['output']):
+        return dict(name=job['name'], status='skipped', frames=0, seconds=time.perf_counter() - start)
+
+    options = {'audio_path': job['audio']}
+    if job.get('lyrics'):
+        timings = read_timings(job['lyrics'])
+        options['timed_lyrics'] = list(zip(timings['times'], timings['lines']))
+        # Only themes that highlight words take word tags (lyrics.py); the rest animate whole lines
+        if timings.get('words') and 'timed_words' in inspect.signature(module.configure).parameters:
+            options['timed_words'] = timings['words']
+    # Drawn at the profile's draw size and written resampled to its output size; without one the
+    # theme goes back to its own size even if an earlier job in this process changed it
+    options['size'] = draw_size(job['resolution']) if job['resolution'] else module.DESIGN_SIZE
+    module.configure(**options)
+
+    total_duration = module.renderer.duration
+    if job['duration'] is not None:
+        total_duration = min(total_duration, job['duration'])
+    fps = job['fps']
+    size = job['resolution'].size if job['resolution'] else (module.WIDTH, module.HEIGHT)
+    frames_at_size = functools.partial(offline_render.resample_frames, module.render_range, size)
+    total_frames = offline_render.frame_count(total_duration, fps)
+    segment_frames = max(1, int(job['segment_seconds'] * fps))
+    segments = [(first, min(first + segment_frames, total_frames))
+                for first in range(0, total_frames, segment_frames)]
+
+    video = offline_render.is_video(job['output'])
+    if video:
+        # Finished segments stay on disk between runs; they are stitched once all exist
+        segment_dir = job['output'] + '.segments'
+        os.makedirs(segment_dir, exist_ok=True)
+        extension = os.path.splitext(job['output'])[1]
+        targets = [os.path.join(segment_dir, f"segment_{i:05d}{extension}") for i in range(len(segments))]
+    else:
+        targets = [job['output']] * len(segments)
+
+    def rendered(index):
+        # A checkpointed segment whose files were deleted since is rendered again
+        if video:
+            return os.path.exists(targets[index])
+        first, last = segments[index]
+        return all(os.path.exists(os.path.join(job['output'], f"frame_{i:06d}.{job['image_format']}"))
+                   for i in range(first, last))
+
+    resumed = 0
+    frames = 0
+    for index, ((first, last), target) in enumerate(zip(segments, targets)):
+        if index in checkpoint.segments and rendered(index):
+            resumed += 1
+            continue
+        frames += offline_render.write_frames(frames_at_size, first, last, size, fps, target,
+                                              job['image_format'])
+        checkpoint.mark(index)
+
+    if video:
+        audio = job['audio'] if job['audio_in_output'] else None
+        offline_render.concat_segments(targets, job['output'], audio)
+    # Finished before the segments go, so a crash in between never leaves a checkpoint that
+    # lists segments which no longer exist
+    checkpoint.finish()
+    if video:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    return dict(name=job['name'], status='resumed' if resumed else 'rendered', frames=frames,
+                seconds=time.perf_counter() - start, song_seconds=frames / fps,
+                resolution=f"{size[0]}x{size[1]}", fps=fps)
+
+
+def run_job(job):
+    # Pool entry point: a failing song is reported in the summary instead of stopping the batch
+    os.chdir(SCRIPT_DIR)  # themes load their images and fonts relative to the scripts
+    try:
+        return render_job(job)
+    except Exception as e:
+        return dict(name=job['name'], status='failed', frames=0, seconds=0.0, error=f"{type(e).__name__}: {e}")
+
+
+def run_batch(jobs, workers=1):
+    jobs = sorted(jobs, key=estimate_cost, reverse=True)
+    start = time.perf_counter()
+    results = []
+    if workers > 1:
+        # spawn: workers import the themes fresh, then keep them for every job they run
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers) as pool:
+            for result in pool.imap_unordered(run_job, jobs):
+                print(describe_job(result))
+                results.append(result)
+            pool.close()
+            pool.join()
+    else:
+        for job in jobs:
+            result = run_job(job)
+            print(describe_job(result))
+            results.append(result)
+    return results, time.perf_counter() - start
+
+
+def describe_job(result):
+    line = f"[{result['status']}] {result['name']}"
+    if result['status'] in ('rendered', 'resumed'):
+        fps = result['frames'] / result['seconds'] if result['seconds'] > 0 else float('inf')
+        line += (f": {result['frames']} frames at {result['resolution']} in {result['seconds']:.1f}s "
+                 f"({fps:.1f} fps, {result['song_seconds'] / result['seconds']:.2f}x real time)")
+    elif result['status'] == 'failed':
+        line += f": {result['error']}"
+    return line
+
+
+def print_summary(results, elapsed, workers):
+    frames = sum(result['frames'] for result in results)
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    print(f"\n{'job':30} {'status':>9} {'frames':>8} {'wall s':>8} {'fps':>8}")
+    for result in sorted(results, key=lambda result: result['name']):
+        fps = result['frames'] / result['seconds'] if result['seconds'] > 0 and result['frames'] else 0.0
+        print(f"{result['name']:30} {result['status']:>9} {result['frames']:8d} {result['seconds']:8.1f} {fps:8.1f}")
+    status = ', '.join(f"{count} {name}" for name, count in sorted(counts.items()))
+    print(f"Batch: {len(results)} jobs ({status}), {frames} frames in {elapsed:.1f}s with {workers} worker(s) "
+          f"({frames / elapsed if elapsed > 0 else 0.0:.1f} fps overall)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render every song in a manifest")
+    parser.add_argument('manifest', help="JSON manifest of songs to render")
+    parser.add_argument('--workers', type=int, default=1, help="Songs rendered at the same time")
+    parser.add_argument('--only', nargs='+', metavar='NAME', help="Render only these jobs")
+    parser.add_argument('--restart', action='store_true', help="Ignore checkpoints and render everything again")
+    parser.add_argument('--summary', metavar='PATH', help="Write the per-job results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = load_manifest(args.manifest)
+    if args.only:
+        jobs = [job for job in jobs if job['name'] in args.only]
+    if args.restart:
+        for job in jobs:
+            checkpoint = job['output'].rstrip('/\\') + '.checkpoint.json'
+            if os.path.exists(checkpoint):
+                os.remove(checkpoint)
+
+    results, elapsed = run_batch(jobs, args.workers)
+    print_summary(results, elapsed, args.workers)
+    if args.summary:
+        with open(args.summary, 'w') as f:
+            json.dump({'seconds': elapsed, 'workers': args.workers, 'jobs': results}, f, indent=1)
+    return 1 if any(result['status'] == 'failed' for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
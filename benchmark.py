@@ -0,0 +1,439 @@
+import argparse
+import functools
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import offline_render
+
+offline_render.use_headless_drivers()
+
+import pygame
+
+from assets import resident_memory_mb
+from offline_render import load_script
+from lyric_timeline import LyricTimeline
+from render_cache import LayerLRU
+from render_profiles import RENDER_PROFILES, draw_size
+from text_cache import TextCache
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4k': (3840, 2160)}
+PARTICLE_COUNTS = [100, 10000, 100000]
+LYRIC_TEXTS = {
+    'short': "Ay",
+    'medium': "Someone go hand him a Grammy right now",
+    'long': "Got so drunk, he hit his head on the sidewalk, but he good, he gon' be alright, "
+            "we just left Whiskey Road thirty minutes ago",
+}
+WARMUP_FRAMES = 5  # untimed frames per case, so caches are filled as in steady playback
+STARTUP_SCRIPTS = {'lyrics': 'lyrics.py', 'copy': 'lyrics copy.py'}
+# Run in a fresh interpreter: imports a script and renders its first frame, timing both
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import offline_render
+offline_render.use_headless_drivers()
+dependencies = time.perf_counter()
+module = offline_render.load_script(sys.argv[1], 'probe')
+imported = time.perf_counter()
+next(module.render_range(0, 1, 60))
+drawn = time.perf_counter()
+print(json.dumps({'dependencies_ms': (dependencies - start) * 1000, 'import_ms': (imported - dependencies) * 1000,
+                  'first_frame_ms': (drawn - start) * 1000}))
+"""
+
+LONGFORM_MINUTES = [1, 4, 16]
+# Run in a fresh interpreter: analyses a track and renders its last frames, reporting peak RSS
+LONGFORM_PROBE = """
+import json, sys, time
+import offline_render
+offline_render.use_headless_drivers()
+from assets import resident_memory_mb
+from benchmark import peak_rss_mb
+module = offline_render.load_script(sys.argv[1], 'probe')
+module.configure(audio_path=sys.argv[2])
+start = time.perf_counter()
+module.renderer.load_cues()
+analysis_seconds = time.perf_counter() - start
+frames, fps = int(sys.argv[3]), 30
+total = offline_render.frame_count(module.renderer.duration, fps)
+frame_ms = []
+start = time.perf_counter()
+for _ in module.render_range(total - frames, total, fps):
+    frame_ms.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+print(json.dumps({'analysis_seconds': analysis_seconds, 'frame_ms': frame_ms,
+                  'rss_mb': resident_memory_mb(), 'peak_rss_mb': peak_rss_mb()}))
+"""
+
+
+def time_per_call(draw, frames=120, fps=60):
+    start = time.perf_counter()
+    for frame_index in range(frames):
+        draw(frame_index / fps)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+# Per-frame implementations the static layers replaced, kept as the "before" reference
+
+def legacy_scene_layers(lyrics):
+    width, height = lyrics.WIDTH, lyrics.HEIGHT
+    skyline = pygame.Surface((width * 2, height // 2))
+    lyrics.build_skyline(skyline)
+
+    def draw(current_time):
+        screen = lyrics.renderer.screen
+        color = int(128 + 127 * math.sin(current_time * 2))
+        screen.fill((color // 8, color // 8, color // 4))
+        x = int(current_time * 50) % width
+        screen.blit(skyline, (-x, 0))
+        screen.blit(skyline, (width - x, 0))
+        pygame.draw.rect(screen, (100, 100, 100), (0, height - 100, width, 100))
+        for i in range(0, width, 50):
+            pygame.draw.line(screen, (150, 150, 150), (i, height - 100), (i + 25, height), 2)
+    return draw
+
+
+def legacy_background_effect(copy):
+    def draw(current_time):
+        for i in range(0, copy.WIDTH, 40):
+            for j in range(0, copy.HEIGHT, 40):
+                color = [(math.sin(current_time + i * 0.01) + 1) / 2 * 255,
+                         (math.cos(current_time + j * 0.01) + 1) / 2 * 255,
+                         (math.sin(current_time * 0.5) + 1) / 2 * 255]
+                pygame.draw.rect(copy.renderer.screen, color, (i, j, 40, 40), 1)
+    return draw
+
+
+def bench_layers(frames):
+    lyrics = load_script('lyrics.py', 'lyrics')
+
+    def cached_scene_layers(current_time):
+        lyrics.draw_pulsating_background(lyrics.renderer.screen, current_time)
+        lyrics.draw_scrolling_skyline(lyrics.renderer.screen, current_time)
+        lyrics.draw_sidewalk(lyrics.renderer.screen)
+
+    results = [('lyrics.py background + skyline + sidewalk',
+                time_per_call(legacy_scene_layers(lyrics), frames),
+                time_per_call(cached_scene_layers, frames))]
+
+    copy = load_script('lyrics copy.py', 'lyrics_copy')
+    results.append(('lyrics copy.py draw_background_effect',
+                    time_per_call(legacy_background_effect(copy), frames),
+                    time_per_call(lambda t: copy.draw_background_effect(copy.renderer.screen, t), frames)))
+
+    print(f"{'stage':45} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name, before, after in results:
+        print(f"{name:45} {before:10.3f} {after:10.3f} {before / after:7.1f}x")
+    return results
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS; it only ever grows within a process
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def sample_calls(call, frames, fps=60, warmup=WARMUP_FRAMES):
+    # Per-call times in ms on the fixed frame clock, after a few untimed warm-up calls
+    for frame_index in range(warmup):
+        call(frame_index, frame_index / fps)
+    samples = []
+    for frame_index in range(warmup, warmup + frames):
+        start = time.perf_counter_ns()
+        call(frame_index, frame_index / fps)
+        samples.append((time.perf_counter_ns() - start) / 1e6)
+    return samples
+
+
+def result(suite, name, samples, **params):
+    values = np.array(samples)
+    return dict(suite=suite, name=name, calls=len(values),
+                fps=float(1000 / values.mean()),
+                p50_ms=float(np.percentile(values, 50)),
+                p99_ms=float(np.percentile(values, 99)),
+                rss_mb=resident_memory_mb(),
+                peak_rss_mb=peak_rss_mb(),
+                **params)
+
+
+def seeded(frame_index):
+    # Same seeding as the offline renderer, so every run draws the same frames
+    offline_render.seed_frame(frame_index)
+    return offline_render.frame_rng(frame_index, 'particles')
+
+
+def fill_particles(module, count, rng):
+    # Top the system up to count live particles with the script's own spawner
+    if len(module.particles) < count:
+        module.create_particles(count - len(module.particles), rng)
+
+
+def repeated_timeline(text, frames, fps=60, line_seconds=1.0):
+    # One line per second, so the copy script's transitions run for a fifth of the frames
+    lines = int((frames + WARMUP_FRAMES) / fps / line_seconds) + 2
+    return LyricTimeline([(i * line_seconds, text) for i in range(lines)], lines * line_seconds)
+
+
+def micro_cases(lyrics, copy):
+    copy_timeline = repeated_timeline(LYRIC_TEXTS['medium'], 10000)
+
+    def neon_text(i, t):
+        # Karaoke highlight sweeping across the line every four seconds
+        words = len(LYRIC_TEXTS['long'].split())
+        lyrics.draw_neon_text(lyrics.renderer.screen, LYRIC_TEXTS['long'], t % 4 / 4 * words, t)
+
+    def cold_neon_text(i, t):
+        lyrics.text_cache = TextCache()
+        lyrics.text_layers = LayerLRU()
+        neon_text(i, t)
+
+    def particles(module, count, draw):
+        def call(i, t):
+            rng = seeded(i)
+            fill_particles(module, count, rng)
+            draw(rng)
+        return call
+
+    return [
+        ('lyrics.draw_neon_text', lyrics, neon_text),
+        ('lyrics.draw_neon_text (cold cache)', lyrics, cold_neon_text),
+        ('lyrics.update_particles 10k', lyrics,
+         particles(lyrics, 10000, lambda rng: lyrics.update_particles(lyrics.particles, 1 / 60))),
+        ('lyrics.draw_particles 10k', lyrics,
+         particles(lyrics, 10000, lambda rng: lyrics.draw_particles(lyrics.renderer.screen, lyrics.particles))),
+        ('lyrics.draw_scrolling_skyline', lyrics, lambda i, t: lyrics.draw_scrolling_skyline(lyrics.renderer.screen, t)),
+        ('lyrics.draw_frame', lyrics, lambda i, t: lyrics.draw_frame(lyrics.renderer.screen, t, 1 / 60, seeded(i))),
+        ('copy.create_aggressive_text', copy, lambda i, t: copy.create_aggressive_text(LYRIC_TEXTS['medium'])),
+        ('copy.draw_background_effect', copy, lambda i, t: copy.draw_background_effect(copy.renderer.screen, t)),
+        ('copy.transition_effect', copy, lambda i, t: copy.transition_effect(copy.renderer.screen, (i % 60) / 60)),
+        ('copy.draw_particles 10k', copy,
+         particles(copy, 10000, lambda rng: copy.draw_particles(copy.renderer.screen))),
+        ('copy.draw_visual_elements', copy,
+         lambda i, t: copy.draw_visual_elements(copy.renderer.screen, copy_timeline.state_at(t), copy_timeline, t)),
+        ('copy.draw_frame', copy, lambda i, t: copy.draw_frame(copy.renderer.screen, t, copy_timeline, seeded(i))),
+    ]
+
+
+def bench_micro(lyrics, copy, frames):
+    results = []
+    for name, module, call in micro_cases(lyrics, copy):
+        module.set_resolution(module.DESIGN_SIZE)
+        results.append(result('micro', name, sample_calls(call, frames), resolution=f"{module.WIDTH}x{module.HEIGHT}"))
+    return results
+
+
+def bench_macro(lyrics, copy, frames, resolutions, particle_counts, lyric_lengths):
+    results = []
+    # lyrics.py reads its timeline from the module; the song's is put back so later suites time the song
+    song_timeline = lyrics.timeline
+    try:
+        for script, module in (('lyrics', lyrics), ('copy', copy)):
+            for resolution in resolutions:
+                module.set_resolution(RESOLUTIONS[resolution])
+                for count in particle_counts:
+                    for length in lyric_lengths:
+                        timeline = repeated_timeline(LYRIC_TEXTS[length], frames)
+                        module.particles.clear()
+
+                        def call(i, t):
+                            rng = seeded(i)
+                            fill_particles(module, count, rng)
+                            if script == 'lyrics':
+                                module.timeline = timeline
+                                module.draw_frame(module.renderer.screen, t, 1 / 60, rng)
+                            else:
+                                module.draw_frame(module.renderer.screen, t, timeline, rng)
+
+                        name = f"{script} frame {resolution} {count} particles {length} lyric"
+                        results.append(result('macro', name, sample_calls(call, frames), script=script,
+                                              resolution=resolution, particles=count, lyric=length))
+            module.set_resolution(module.DESIGN_SIZE)
+    finally:
+        lyrics.timeline = song_timeline
+    return results
+
+
+def bench_profiles(lyrics, copy, frames, profiles, fps=30):
+    # Whole offline frames as a render writes them: drawn at each profile's draw size through
+    # render_range (seeding, particles, effects) and resampled to its output size
+    results = []
+    for script, module in (('lyrics', lyrics), ('copy', copy)):
+        for name in profiles:
+            profile = RENDER_PROFILES[name]
+            module.set_resolution(draw_size(profile))
+            render_range = functools.partial(module.render_range, size=draw_size(profile))
+            # The first frames fill the profile's text, layer and sprite caches
+            for _ in offline_render.resample_frames(render_range, profile.size, 0, WARMUP_FRAMES, fps):
+                pass
+            samples = []
+            start = time.perf_counter_ns()
+            for _ in offline_render.resample_frames(render_range, profile.size, WARMUP_FRAMES,
+                                                    WARMUP_FRAMES + frames, fps):
+                samples.append((time.perf_counter_ns() - start) / 1e6)
+                start = time.perf_counter_ns()
+            width, height = profile.size
+            drawn = 'x'.join(map(str, draw_size(profile)))
+            results.append(result('profiles', f"{script} profile {name} {width}x{height} (drawn {drawn})", samples,
+                                  script=script, profile=name, resolution=f"{width}x{height}", drawn=drawn,
+                                  megapixels_per_second=float(width * height * 1000 / np.mean(samples) / 1e6)))
+        module.set_resolution(module.DESIGN_SIZE)
+    return results
+
+
+def bench_startup(runs):
+    # Cold start in new processes: shared dependencies, the script itself, and through the first frame.
+    # Peak RSS in these rows is this process's, not the probes'
+    results = []
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    for script, path in STARTUP_SCRIPTS.items():
+        samples = {'dependencies_ms': [], 'import_ms': [], 'first_frame_ms': [], 'process_ms': []}
+        for _ in range(runs):
+            start = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', STARTUP_PROBE, path], env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            process_ms = (time.perf_counter() - start) * 1000
+            probe = json.loads(output.strip().splitlines()[-1])
+            for key, value in probe.items():
+                samples[key].append(value)
+            samples['process_ms'].append(process_ms)
+        results.append(result('startup', f"{script} import numpy + pygame", samples['dependencies_ms'], script=script))
+        results.append(result('startup', f"{script} import script", samples['import_ms'], script=script))
+        results.append(result('startup', f"{script} import to first frame", samples['first_frame_ms'], script=script))
+        results.append(result('startup', f"{script} process start to exit after first frame", samples['process_ms'],
+                              script=script))
+    return results
+
+
+def synthetic_track(path, seconds, sample_rate=44100, chunk_seconds=10):
+    # Clicks on a 120 BPM grid over quiet noise, written a chunk at a time
+    rng = np.random.default_rng(0)
+    total = int(seconds * sample_rate)
+    chunk = chunk_seconds * sample_rate
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for first in range(0, total, chunk):
+            t = np.arange(first, min(first + chunk, total))
+            click = np.exp(-(t % (sample_rate // 2)) / 400.0) * np.sin(t * 0.3)
+            signal = np.clip(rng.normal(0, 0.05, len(t)) + 0.8 * click, -1, 1)
+            pcm = (signal * 32767).astype(np.int16)
+            f.writeframes(np.repeat(pcm[:, None], 2, axis=1).tobytes())
+
+
+def bench_longform(frames, minutes):
+    # Same render at growing track lengths, each in a fresh process: analysis and the last frames
+    # of the track. Peak RSS in these rows is the probe's and should not grow with the length
+    results = []
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    with tempfile.TemporaryDirectory(prefix='longform_') as directory:
+        for length in minutes:
+            track = os.path.join(directory, f"synthetic_{length:g}min.wav")
+            synthetic_track(track, length * 60)
+            for script, path in STARTUP_SCRIPTS.items():
+                output = subprocess.run([sys.executable, '-c', LONGFORM_PROBE, path, track, str(frames)], env=env,
+                                        check=True, capture_output=True, text=True).stdout
+                probe = json.loads(output.strip().splitlines()[-1])
+                row = result('longform', f"{script} {length:g} min track, last {frames} frames", probe['frame_ms'],
+                             script=script, track_minutes=length, analysis_seconds=probe['analysis_seconds'])
+                row.update(rss_mb=probe['rss_mb'], peak_rss_mb=probe['peak_rss_mb'])
+                results.append(row)
+            os.remove(track)
+    return results
+
+
+def print_results(results):
+    print(f"{'benchmark':58} {'fps':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['name']:58} {r['fps']:8.1f} {r['p50_ms']:8.3f} {r['p99_ms']:8.3f} {r['peak_rss_mb']:12.1f}")
+
+
+def compare(results, baseline_path, tolerance):
+    # A benchmark regresses when its p50 is more than tolerance slower than the baseline's
+    with open(baseline_path) as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\n{'benchmark':58} {'base p50':>9} {'p50':>9} {'change':>8}")
+    for r in results:
+        base = baseline.get(r['name'])
+        if base is None:
+            continue
+        change = r['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        flag = '  REGRESSION' if change > tolerance else ''
+        print(f"{r['name']:58} {base['p50_ms']:9.3f} {r['p50_ms']:9.3f} {change:+8.1%}{flag}")
+        if flag:
+            regressions.append(r['name'])
+    print(f"{len(regressions)} regression(s) beyond {tolerance:.0%} against '{baseline_path}'")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the lyric video render pipeline")
+    parser.add_argument('frames', nargs='?', type=int, default=240,
+                        help="Timed frames (calls) per benchmark")
+    parser.add_argument('--suite', choices=['layers', 'startup', 'micro', 'macro', 'profiles', 'longform', 'all'],
+                        default='all')
+    parser.add_argument('--startup-runs', type=int, default=5, help="Fresh processes per cold-start benchmark")
+    parser.add_argument('--track-minutes', nargs='+', type=float, default=LONGFORM_MINUTES,
+                        help="Synthetic track lengths for the longform suite")
+    parser.add_argument('--resolutions', nargs='+', choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument('--profiles', nargs='+', choices=list(RENDER_PROFILES), default=list(RENDER_PROFILES),
+                        help="Render profiles for the profiles suite")
+    parser.add_argument('--particles', nargs='+', type=int, default=PARTICLE_COUNTS)
+    parser.add_argument('--lyrics', nargs='+', choices=list(LYRIC_TEXTS), default=['short', 'long'])
+    parser.add_argument('--json', metavar='PATH', help="Write the results as JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="Compare against results saved with --json")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed p50 slowdown against the baseline before failing (default 0.10)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.suite == 'layers':
+        bench_layers(args.frames)
+        return 0
+
+    results = []
+    if args.suite in ('startup', 'all'):
+        results += bench_startup(args.startup_runs)
+    if args.suite == 'longform':
+        # Minutes of audio per length, so it only runs when asked for
+        results += bench_longform(args.frames, args.track_minutes)
+
+    lyrics = load_script('lyrics.py', 'lyrics')
+    copy = load_script('lyrics copy.py', 'lyrics_copy')
+
+    if args.suite in ('micro', 'all'):
+        results += bench_micro(lyrics, copy, args.frames)
+    if args.suite in ('macro', 'all'):
+        results += bench_macro(lyrics, copy, args.frames, args.resolutions, args.particles, args.lyrics)
+    if args.suite in ('profiles', 'all'):
+        results += bench_profiles(lyrics, copy, args.frames, args.profiles)
+    print_results(results)
+
+    if args.json:
+        meta = dict(frames=args.frames, warmup=WARMUP_FRAMES, python=platform.python_version(),
+                    pygame=pygame.version.ver, numpy=np.__version__, machine=platform.machine(),
+                    processor=platform.processor(), created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=1)
+        print(f"Wrote {len(results)} results to '{args.json}'")
+    if args.baseline:
+        return 1 if compare(results, args.baseline, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
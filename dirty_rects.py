@@ -0,0 +1,59 @@
+import pygame
+
+
+class DirtyRegion:
+    """Collects the rectangles that changed this frame and presents only those.
+
+    The whole frame is still redrawn into the screen surface; only the copy to the display
+    is limited. Areas changed last frame are updated again so their old content is replaced.
+    When the changed area exceeds threshold (a fraction of the screen) a full flip is cheaper.
+    """
+
+    def __init__(self, size, threshold=0.75):
+        self.screen_rect = pygame.Rect((0, 0), size)
+        self.threshold = threshold
+        self.rects = []
+        self.previous = []
+        self.full = True  # Nothing has been presented yet
+        self.flips = 0
+        self.partial_updates = 0
+        self.updated_area = 0
+
+    def add(self, rects):
+        if rects is None:
+            return
+        if isinstance(rects, pygame.Rect):
+            rects = [rects]
+        for rect in rects:
+            if rect is None:
+                continue
+            rect = rect.clip(self.screen_rect)
+            if rect.width and rect.height:
+                self.rects.append(rect)
+
+    def mark_full(self):
+        self.full = True
+
+    def present(self):
+        rects = self.rects + self.previous
+        # Overlaps are counted twice, which only errs towards flipping
+        area = sum(rect.width * rect.height for rect in rects)
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        if self.full or area > self.threshold * screen_area:
+            pygame.display.flip()
+            self.flips += 1
+            self.updated_area += screen_area
+        else:
+            pygame.display.update(rects)
+            self.partial_updates += 1
+            self.updated_area += area
+        self.previous = self.rects
+        self.rects = []
+        self.full = False
+
+    def describe(self):
+        frames = self.flips + self.partial_updates
+        screen_area = self.screen_rect.width * self.screen_rect.height
+        average = self.updated_area / (frames * screen_area) if frames else 0.0
+        return (f"Dirty rects: {self.partial_updates} partial updates, {self.flips} full flips, "
+                f"{average:.1%} of the screen presented per frame on average")
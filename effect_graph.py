@@ -0,0 +1,89 @@
+import json
+from collections import namedtuple
+
+EffectNode = namedtuple('EffectNode', 'effect draw params start end')
+# What a node draws from: the frame time, the line's 0-1 effect progress, the y just below the
+# lyric and the LyricState of the line
+EffectState = namedtuple('EffectState', 'time progress below lyric')
+
+SELECTOR_KEYS = ('effect', 'match', 'line', 'start', 'end')
+
+
+class EffectGraph:
+    """Effect nodes for each lyric line, read from a JSON file and compiled into a dispatch table.
+
+    The file maps stage names (the points in a frame where effects are drawn) to two lists of
+    rules. Each rule names an effect node; every other key except the selectors is passed to
+    the node as a parameter.
+    - "lines": the first rule matching a line is used. "match" is a keyword, or a list of
+      keywords that must all appear (case-insensitive). "line" picks a line by index.
+    - "always": every rule is used on every line.
+    Any rule may also set "start" and/or "end" in seconds to play only within that time range.
+    compile() resolves the rules once per timeline, so a frame indexes the table and calls its
+    nodes. A new effect is a new rule, or a new entry in `nodes`.
+    """
+
+    def __init__(self, stages, nodes):
+        self.stages = stages
+        self.nodes = nodes
+        unknown = {rule['effect'] for groups in stages.values() for rules in groups.values() for rule in rules}
+        unknown -= set(nodes)
+        if unknown:
+            raise ValueError(f"Effect graph uses unknown effect(s): {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def load(cls, path, nodes):
+        with open(path) as f:
+            return cls(json.load(f), nodes)
+
+    def node(self, rule):
+        params = {key: value for key, value in rule.items() if key not in SELECTOR_KEYS}
+        return EffectNode(rule['effect'], self.nodes[rule['effect']], params, rule.get('start'), rule.get('end'))
+
+    @staticmethod
+    def matches(rule, index, text, start, end):
+        if 'line' in rule and rule['line'] != index:
+            return False
+        if rule.get('start') is not None and rule['start'] >= end:
+            return False
+        if rule.get('end') is not None and rule['end'] <= start:
+            return False
+        keywords = rule.get('match', ())
+        keywords = [keywords] if isinstance(keywords, str) else keywords
+        text = text.lower()
+        return all(keyword.lower() in text for keyword in keywords)
+
+    def compile(self, timeline):
+        # timeline is a LyricTimeline; each line gets one tuple of nodes per stage
+        tables = {}
+        for stage, groups in self.stages.items():
+            table = []
+            for index in range(len(timeline)):
+                start, text = timeline[index]
+                end = timeline.end_of(index)
+                first = next((rule for rule in groups.get('lines', ())
+                              if self.matches(rule, index, text, start, end)), None)
+                nodes = [] if first is None else [self.node(first)]
+                nodes += [self.node(rule) for rule in groups.get('always', ())
+                          if self.matches(rule, index, text, start, end)]
+                table.append(tuple(nodes))
+            tables[stage] = table
+        return EffectTable(tables)
+
+
+class EffectTable:
+    """Compiled EffectGraph: the nodes of every line, per stage."""
+
+    def __init__(self, stages):
+        self.stages = stages
+
+    def nodes(self, stage, index):
+        table = self.stages.get(stage)
+        if table is None or not 0 <= index < len(table):
+            return ()
+        return table[index]
+
+    def draw(self, stage, index, screen, state):
+        for node in self.nodes(stage, index):
+            if (node.start is None or state.time >= node.start) and (node.end is None or state.time < node.end):
+                node.draw(screen, state, **node.params)
@@ -0,0 +1,164 @@
+import csv
+import json
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import pygame
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class FrameProfiler:
+    """Per-stage frame timings from perf_counter_ns, with an overlay and CSV/Chrome-trace dumps.
+
+    Wrap each draw stage in `with profiler.stage('name'):` and call end_frame() once per
+    frame. While disabled stage() hands back one shared no-op context manager, so the
+    instrumentation costs a method call per stage. Per-stage times are kept in a rolling
+    window of the last `window` frames; individual events are kept (up to max_events) for
+    the trace dump. A frame counts as dropped when it took longer than 1.5 budgets.
+    """
+
+    def __init__(self, enabled=False, window=300, budget_ms=1000 / 60, max_events=200000):
+        self.enabled = enabled
+        self.window = window
+        self.budget_ns = int(budget_ms * 1e6)
+        self.max_events = max_events
+        self.stages = OrderedDict()
+        self.current = {}
+        self.frame_times = deque(maxlen=window)
+        self.events = []
+        self.frames = 0
+        self.dropped = 0
+        self.origin = time.perf_counter_ns()
+        self.last_frame_end = None
+        self.overlay_visible = enabled
+        self.overlay = None
+        self.overlay_interval = 15  # frames between overlay text refreshes
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, start, end):
+        duration = end - start
+        self.current[name] = self.current.get(name, 0) + duration
+        if len(self.events) < self.max_events:
+            self.events.append((self.frames, name, start - self.origin, duration))
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        for name, duration in self.current.items():
+            if name not in self.stages:
+                self.stages[name] = deque(maxlen=self.window)
+            self.stages[name].append(duration)
+        self.current = {}
+        if self.last_frame_end is not None:
+            frame_time = now - self.last_frame_end
+            self.frame_times.append(frame_time)
+            if frame_time > self.budget_ns * 1.5:
+                self.dropped += 1
+        self.last_frame_end = now
+        self.frames += 1
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.overlay = None
+
+    def summary(self):
+        # (stage, p50 ms, p99 ms, max ms) over the rolling window
+        rows = []
+        for name, samples in self.stages.items():
+            values = np.array(samples, dtype=np.float64) / 1e6
+            rows.append((name, float(np.percentile(values, 50)), float(np.percentile(values, 99)),
+                         float(values.max())))
+        return rows
+
+    def frame_summary(self):
+        if not self.frame_times:
+            return None
+        values = np.array(self.frame_times, dtype=np.float64) / 1e6
+        return float(np.percentile(values, 50)), float(np.percentile(values, 99))
+
+    def overlay_lines(self):
+        lines = [f"{name:<18}{p50:6.2f}{p99:7.2f} ms" for name, p50, p99, _ in self.summary()]
+        frame = self.frame_summary()
+        if frame is not None:
+            lines.append(f"{'frame':<18}{frame[0]:6.2f}{frame[1]:7.2f} ms")
+        lines.append(f"dropped {self.dropped}/{self.frames}")
+        return lines
+
+    def draw_overlay(self, surface, font):
+        # Returns the rect drawn so dirty-rect presenting picks it up
+        if not (self.enabled and self.overlay_visible):
+            return None
+        if self.overlay is None or self.frames % self.overlay_interval == 0:
+            lines = [font.render(line, True, (255, 255, 255)) for line in self.overlay_lines()]
+            width = max(line.get_width() for line in lines) + 16
+            height = sum(line.get_height() for line in lines) + 16
+            self.overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+            self.overlay.fill((0, 0, 0, 180))
+            y = 8
+            for line in lines:
+                self.overlay.blit(line, (8, y))
+                y += line.get_height()
+        x = surface.get_width() - self.overlay.get_width() - 10
+        return surface.blit(self.overlay, (x, 10))
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'stage', 'start_us', 'duration_us'])
+            for frame, name, start, duration in self.events:
+                writer.writerow([frame, name, start / 1000, duration / 1000])
+
+    def write_trace(self, path):
+        # Chrome trace event format, viewable in chrome://tracing or Perfetto
+        events = [{'name': name, 'cat': 'frame', 'ph': 'X', 'ts': start / 1000, 'dur': duration / 1000,
+                   'pid': 0, 'tid': 0, 'args': {'frame': frame}}
+                  for frame, name, start, duration in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def dump(self, path):
+        if path.endswith('.json'):
+            self.write_trace(path)
+        else:
+            self.write_csv(path)
+        print(f"Wrote {len(self.events)} profile events to '{path}'")
+
+    def describe(self):
+        if not self.frames:
+            return "Profile: no frames recorded"
+        lines = [f"Profile over the last {min(self.frames, self.window)} of {self.frames} frames "
+                 f"({self.dropped} dropped):"]
+        lines += [f"  {name:<18} p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  max {peak:6.2f} ms"
+                  for name, p50, p99, peak in self.summary()]
+        return '\n'.join(lines)
@@ -0,0 +1,120 @@
+import re
+
+import numpy as np
+import pygame
+
+WORD = re.compile(r'\S+')
+
+
+class GlyphMetrics:
+    """Advances and kerning of one font at one size, measured once and kept in compact arrays.
+
+    Latin-1 advances are read in a single font.metrics() call into an int16 array; anything
+    else and each kerning pair is measured with font.size() the first time it is laid out.
+    Advances are whole pixels, so a laid-out line can end a few pixels from font.size().
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.height = font.get_height()
+        self.advances = np.zeros(256, dtype=np.int16)
+        characters = ''.join(chr(code) for code in range(32, 256))
+        for code, metrics in enumerate(font.metrics(characters), 32):
+            if metrics is not None:
+                self.advances[code] = metrics[4]
+        self.other_advances = {}
+        self.kerning = {}
+
+    def advance(self, character):
+        code = ord(character)
+        if code < 256:
+            return int(self.advances[code])
+        advance = self.other_advances.get(character)
+        if advance is None:
+            metrics = self.font.metrics(character)[0]
+            advance = self.other_advances[character] = metrics[4] if metrics else self.font.size(character)[0]
+        return advance
+
+    def kern(self, left, right):
+        pair = left + right
+        kerning = self.kerning.get(pair)
+        if kerning is None:
+            kerning = self.font.size(pair)[0] - self.advance(left) - self.font.size(right)[0]
+            self.kerning[pair] = kerning
+        return kerning
+
+    def layout(self, text):
+        return TextLayout(self, text)
+
+
+class TextLayout:
+    """x position of every character and word of one line, from GlyphMetrics.
+
+    x[i] is where character i starts; words are whitespace-separated runs with their start x
+    and width, in the same order as text.split().
+    """
+
+    def __init__(self, metrics, text):
+        self.text = text
+        self.height = metrics.height
+        steps = np.zeros(len(text) + 1, dtype=np.int32)
+        for i, character in enumerate(text):
+            steps[i + 1] = metrics.advance(character)
+            if i + 1 < len(text):
+                steps[i + 1] += metrics.kern(character, text[i + 1])
+        self.x = np.cumsum(steps)
+        self.width = int(self.x[-1])
+
+        spans = [(match.start(), match.end()) for match in WORD.finditer(text)]
+        self.words = [text[start:end] for start, end in spans]
+        self.word_x = np.array([self.x[start] for start, _ in spans], dtype=np.int32)
+        self.word_width = np.array([self.x[end] - self.x[start] for start, end in spans], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.words)
+
+
+def sung_split(layout, sung_words):
+    # The word being sung and how many of its pixels are sung: with the line, all that sets
+    # how draw_karaoke() draws it
+    current = int(sung_words)
+    if current >= len(layout.words):
+        return current, 0
+    return current, max(0, int(layout.word_width[current] * (sung_words - current)))
+
+
+def karaoke_size(text_cache, layout, size, color, font_path=None):
+    # Word surfaces can reach a few pixels past the laid-out width (see GlyphMetrics) and
+    # below the font's height, so the size covering the line comes from the surfaces drawn
+    width, height = max(1, layout.width), layout.height
+    for i, word in enumerate(layout.words):
+        surface = text_cache.render(word, size, color, font_path)
+        width = max(width, int(layout.word_x[i]) + surface.get_width())
+        height = max(height, surface.get_height())
+    return width, height
+
+
+def draw_karaoke(surface, text_cache, layout, pos, size, color, sung_color, sung_words, font_path=None):
+    """Blit a laid-out line with the first sung_words words (a float) drawn in sung_color.
+
+    Word surfaces come from text_cache, so a frame is only blits: sung words in sung_color,
+    the rest in color, and the word being sung split at its progress into two areas that do
+    not overlap, so the line looks the same drawn onto a transparent layer and blitted later.
+    Returns the rect covering the line.
+    """
+    x, y = pos
+    current, sung_width = sung_split(layout, sung_words)
+    for i, word in enumerate(layout.words):
+        word_pos = (x + int(layout.word_x[i]), y)
+        if i < current:
+            surface.blit(text_cache.render(word, size, sung_color, font_path), word_pos)
+            continue
+        unsung = text_cache.render(word, size, color, font_path)
+        if i == current and sung_width > 0:
+            sung = text_cache.render(word, size, sung_color, font_path)
+            surface.blit(sung, word_pos, pygame.Rect(0, 0, sung_width, sung.get_height()))
+            surface.blit(unsung, (word_pos[0] + sung_width, y),
+                         pygame.Rect(sung_width, 0, unsung.get_width() - sung_width, unsung.get_height()))
+        else:
+            surface.blit(unsung, word_pos)
+    return pygame.Rect(x, y, layout.width, layout.height)
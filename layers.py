@@ -0,0 +1,85 @@
+import numpy as np
+import pygame
+
+
+class LayerCache:
+    """Static scene layers, drawn once and converted to the display's pixel format."""
+
+    def __init__(self):
+        self.layers = {}
+
+    def get(self, name, size, draw, alpha=False):
+        key = (name, tuple(size))
+        layer = self.layers.get(key)
+        if layer is None:
+            surface = pygame.Surface(size, pygame.SRCALPHA if alpha else 0)
+            draw(surface)
+            layer = surface.convert_alpha() if alpha else surface.convert()
+            self.layers[key] = layer
+        return layer
+
+    def clear(self):
+        self.layers.clear()
+
+
+def blit_scrolling(screen, layer, offset, dest=(0, 0)):
+    # A horizontally wrapping strip scrolled left by offset, using two area blits that
+    # together cover exactly the screen width instead of blitting the whole strip twice
+    width = screen.get_width()
+    height = layer.get_height()
+    x, y = dest
+    offset %= width
+    screen.blit(layer, (x, y), pygame.Rect(offset, 0, width - offset, height))
+    if offset:
+        screen.blit(layer, (x + width - offset, y), pygame.Rect(0, 0, offset, height))
+    return pygame.Rect(x, y, width, height)
+
+
+class OutlineGrid:
+    """Outline pixels of a grid of cells, recoloured each frame from per-column and per-row values.
+
+    The geometry comes from pygame.draw.rect once at construction; a frame only writes colours.
+    """
+
+    def __init__(self, size, cell):
+        width, height = size
+        self.columns = len(range(0, width, cell))
+        self.rows = len(range(0, height, cell))
+
+        # Draw every outline with its (column + 1, row + 1) encoded in the red and green channels
+        geometry = pygame.Surface(size)
+        for column, i in enumerate(range(0, width, cell)):
+            for row, j in enumerate(range(0, height, cell)):
+                pygame.draw.rect(geometry, (column + 1, row + 1, 0), (i, j, cell, cell), 1)
+        rgb = pygame.surfarray.array3d(geometry)
+        xs, ys = np.nonzero(rgb[..., 0])
+        # Sorted row-major pixel offsets keep the per-frame scatter cache friendly
+        order = np.argsort(ys * width + xs)
+        self.xs, self.ys = xs[order], ys[order]
+        self.offsets = self.ys * width + self.xs
+        column_index = rgb[self.xs, self.ys, 0].astype(np.intp) - 1
+        row_index = rgb[self.xs, self.ys, 1].astype(np.intp) - 1
+        self.cell_index = row_index * self.columns + column_index
+
+    def draw(self, surface, red, green, blue):
+        """red has one value per column, green one per row, blue is a single value."""
+        red = np.asarray(red).astype(np.uint32)
+        green = np.asarray(green).astype(np.uint32)
+        blue = int(blue)
+
+        if surface.get_bytesize() == 4:
+            rows = pygame.surfarray.pixels2d(surface).T
+            if rows.flags.c_contiguous:
+                # Build one mapped pixel value per cell, then scatter it to every outline pixel
+                red_shift, green_shift, blue_shift, _ = surface.get_shifts()
+                alpha_mask = surface.get_masks()[3]
+                cells = ((green[:, None] << green_shift) | (red[None, :] << red_shift)
+                         | (blue << blue_shift) | alpha_mask)
+                rows.reshape(-1)[self.offsets] = cells.ravel()[self.cell_index]
+                return
+            del rows
+
+        pixels = pygame.surfarray.pixels3d(surface)
+        pixels[self.xs, self.ys, 0] = red[self.cell_index % self.columns]
+        pixels[self.xs, self.ys, 1] = green[self.cell_index // self.columns]
+        pixels[self.xs, self.ys, 2] = blue
@@ -0,0 +1,111 @@
+from bisect import bisect_right
+from collections import namedtuple
+
+LyricState = namedtuple('LyricState', 'index text start end progress next_index next_time')
+
+
+class LyricTimeline:
+    """Timed lyric lines (and optional timed words) answering position queries in O(log n).
+
+    entries are (time, text) pairs. words, if given, holds one list of (time, word) pairs per
+    line. Every query is a pure function of the time, so seeking or scrubbing needs no state.
+    """
+
+    def __init__(self, entries, end_time, words=None):
+        entries = sorted(entries, key=lambda entry: entry[0])
+        self.times = [entry[0] for entry in entries]
+        self.texts = [entry[1] for entry in entries]
+        self.end_time = end_time
+
+        self.word_times = []
+        self.word_lines = []
+        self.words = []
+        for line_index, line_words in enumerate(words or []):
+            for word_time, word in line_words:
+                self.word_times.append(word_time)
+                self.word_lines.append(line_index)
+                self.words.append(word)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index], self.texts[index]
+
+    def index_at(self, current_time):
+        # Index of the line showing at current_time, -1 before the first line starts
+        return bisect_right(self.times, current_time) - 1
+
+    def start_of(self, index):
+        return self.times[index] if index >= 0 else 0.0
+
+    def end_of(self, index):
+        return self.times[index + 1] if index + 1 < len(self.times) else self.end_time
+
+    def state_at(self, current_time):
+        index = self.index_at(current_time)
+        start = self.start_of(index)
+        end = self.end_of(index)
+        duration = end - start
+        progress = min(1.0, max(0.0, (current_time - start) / duration)) if duration > 0 else 1.0
+        next_index = index + 1 if index + 1 < len(self.times) else None
+        return LyricState(
+            index=index,
+            text=self.texts[index] if index >= 0 else None,
+            start=start,
+            end=end,
+            progress=progress,
+            next_index=next_index,
+            next_time=end,
+        )
+
+    def word_index_at(self, current_time):
+        # Index into the flattened word list, -1 before the first timed word
+        return bisect_right(self.word_times, current_time) - 1
+
+    def words_for_line(self, line_index):
+        # Slice of the flattened word list belonging to one line, also found by bisection
+        start = bisect_right(self.word_lines, line_index - 1)
+        end = bisect_right(self.word_lines, line_index)
+        return start, end
+
+    def sung_words(self, line_index, current_time):
+        # Words of the line sung by current_time plus the fraction of the one being sung, so
+        # 2.4 means two words done and 40% of the third; a word lasts until the next one starts
+        start, end = self.words_for_line(line_index)
+        index = bisect_right(self.word_times, current_time, start, end) - 1
+        if index < start:
+            return 0.0
+        word_start = self.word_times[index]
+        word_end = self.word_times[index + 1] if index + 1 < end else self.end_of(line_index)
+        fraction = (current_time - word_start) / (word_end - word_start) if word_end > word_start else 1.0
+        return index - start + min(1.0, fraction)
+
+
+def estimate_word_times(entries, end_time, word_times=None):
+    """Timed words for LyricTimeline: one list of (time, word) pairs per line, in time order.
+
+    word_times may hold a list of start times per line (from an LRC file with word tags) or
+    None for lines without them. Those lines get their line's duration split between their
+    words by length, so longer words take longer to sing.
+    """
+    order = sorted(range(len(entries)), key=lambda i: entries[i][0])
+    words = []
+    for position, i in enumerate(order):
+        start, text = entries[i]
+        line_words = text.split()
+        known = word_times[i] if word_times else None
+        if known is not None and len(known) == len(line_words):
+            words.append(list(zip(known, line_words)))
+            continue
+        end = entries[order[position + 1]][0] if position + 1 < len(order) else end_time
+        weights = [len(word) + 1 for word in line_words]
+        total = sum(weights)
+        elapsed = 0
+        line = []
+        for word, weight in zip(line_words, weights):
+            line.append((start + (end - start) * elapsed / total, word))
+            elapsed += weight
+        words.append(line)
+    return words
+
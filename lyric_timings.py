@@ -0,0 +1,189 @@
+import difflib
+import hashlib
+import json
+import os
+import re
+
+TIMINGS_VERSION = 1
+LRC_LINE = re.compile(r'^\[(\d+):(\d+(?:\.\d+)?)\](.*)$')
+LRC_TAG = re.compile(r'^\[(\w+):(.*)\]$')
+LRC_WORD = re.compile(r'<(\d+):(\d+(?:\.\d+)?)>')  # enhanced LRC word start inside a line
+
+
+def timings_path_for(audio_path, fmt='lrc'):
+    return f"{os.path.splitext(audio_path)[0]}.timings.{fmt}"
+
+
+def lyrics_hash(lines):
+    return hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(max(0.0, seconds), 60)
+    return f"{int(minutes):02d}:{seconds:05.2f}"
+
+
+def write_lrc(path, data):
+    # Hashes ride along as extra ID tags, which LRC players ignore
+    lines = [f"[audio_hash:{data['audio_hash']}]",
+             f"[lyrics_hash:{data['lyrics_hash']}]",
+             f"[version:{data['version']}]"]
+    words = data.get('words') or [None] * len(data['lines'])
+    for t, text, word_times in zip(data['times'], data['lines'], words):
+        if word_times:
+            # Words past the last tag are kept untagged, so saving never changes a line's text
+            line_words = text.split()
+            tagged = [f"<{format_timestamp(w)}>{word}" for w, word in zip(word_times, line_words)]
+            text = ' '.join(tagged + line_words[len(tagged):])
+        lines.append(f"[{format_timestamp(t)}]{text}")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def read_lrc(path):
+    data = {'times': [], 'lines': []}
+    words = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            match = LRC_LINE.match(line)
+            if match:
+                data['times'].append(int(match.group(1)) * 60 + float(match.group(2)))
+                text = match.group(3)
+                word_times = [int(minutes) * 60 + float(seconds) for minutes, seconds in LRC_WORD.findall(text)]
+                words.append(word_times or None)
+                data['lines'].append(' '.join(LRC_WORD.sub('', text).split()) if word_times else text)
+                continue
+            match = LRC_TAG.match(line)
+            if match:
+                data[match.group(1)] = match.group(2)
+    data['version'] = int(data.get('version', 0))
+    if any(words):
+        data['words'] = words
+    return data
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_timings(path):
+    return read_json(path) if path.endswith('.json') else read_lrc(path)
+
+
+def write_timings(path, data):
+    if path.endswith('.json'):
+        write_json(path, data)
+    else:
+        write_lrc(path, data)
+
+
+class TimingFile:
+    """Tapped lyric start times saved next to the audio file, keyed by audio and lyric hashes.
+
+    Word start times (enhanced LRC word tags) are kept for lines that have them and dropped
+    when their line is marked again.
+
+    The format follows the extension: .lrc for standard LRC, .json for the compact variant.
+    When the lyrics were edited since the file was saved, lines that still match keep their
+    times and only the changed ones are left for re-marking (see missing()). changed is set
+    whenever the times differ from the file. Lines without a time yet are left out when
+    saving, so a partly marked file keeps its taps and the rest are re-marked next time.
+    """
+
+    def __init__(self, path, audio_hash, lines):
+        self.path = path
+        self.audio_hash = audio_hash
+        self.lines = list(lines)
+        self.lyrics_hash = lyrics_hash(self.lines)
+        self.times = [None] * len(self.lines)
+        self.word_times = [None] * len(self.lines)
+        self.status = 'new'
+        self.changed = False
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            data = read_timings(self.path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable timing file '{self.path}': {e}")
+            return
+        if data.get('version') != TIMINGS_VERSION or data.get('audio_hash') != self.audio_hash:
+            self.status = 'stale'
+            return
+        if data.get('lyrics_hash') == self.lyrics_hash and len(data['times']) == len(self.lines):
+            self.times = list(data['times'])
+            self.word_times = list(data.get('words') or self.word_times)
+            self.status = 'valid'
+            return
+
+        # Carry times over for the lines the edit left alone
+        matcher = difflib.SequenceMatcher(a=data['lines'], b=self.lines, autojunk=False)
+        for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+            if tag == 'equal':
+                self.times[new_start:new_end] = data['times'][old_start:old_end]
+                if data.get('words'):
+                    self.word_times[new_start:new_end] = data['words'][old_start:old_end]
+        if data.get('lyrics_hash') == self.lyrics_hash:
+            self.status = 'partial'  # Saved before every line was marked
+        else:
+            self.status = 'edited'
+            self.changed = True
+
+    def missing(self):
+        return [i for i, t in enumerate(self.times) if t is None]
+
+    def missing_runs(self):
+        # Consecutive missing lines are re-marked together in one pass over the audio
+        runs = []
+        for i in self.missing():
+            if runs and runs[-1][-1] == i - 1:
+                runs[-1].append(i)
+            else:
+                runs.append([i])
+        return runs
+
+    def complete(self):
+        return not self.missing()
+
+    def set(self, index, lyric_time):
+        self.times[index] = lyric_time
+        self.word_times[index] = None
+        self.changed = True
+
+    def remark(self):
+        # Forget every time so each line is marked again
+        self.times = [None] * len(self.lines)
+        self.word_times = [None] * len(self.lines)
+        self.status = 'remarked'
+        self.changed = True
+
+    def timed_lyrics(self):
+        return [(t, line) for t, line in zip(self.times, self.lines) if t is not None]
+
+    def save(self):
+        marked = [i for i, t in enumerate(self.times) if t is not None]
+        data = {
+            'version': TIMINGS_VERSION,
+            'audio_hash': self.audio_hash,
+            'lyrics_hash': self.lyrics_hash,
+            'times': [round(self.times[i], 3) for i in marked],
+            'lines': [self.lines[i] for i in marked],
+        }
+        words = [self.word_times[i] for i in marked]
+        if any(words):
+            data['words'] = [None if line is None else [round(t, 3) for t in line] for line in words]
+        write_timings(self.path, data)
+        self.changed = False
+
+    def describe(self):
+        marked = len(self.lines) - len(self.missing())
+        return f"Timings '{self.path}': {self.status}, {marked}/{len(self.lines)} lines marked"
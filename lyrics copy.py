@@ -1,16 +1,39 @@
 import pygame
 import random
 import math
+import sys
+import numpy as np
 from pygame import gfxdraw
-from mutagen.mp3 import MP3
 import colorsys
 import os 
-# Initialize Pygame and its mixer
-pygame.init()
-pygame.mixer.init()
-
-# Constants
-WIDTH, HEIGHT = 1280, 720
+import time
+import functools
+import offline_render
+from text_cache import TextCache
+from particle_system import ParticleSystem
+from layers import OutlineGrid
+from sprite_atlas import SpriteAtlas
+from assets import AssetManager
+from dirty_rects import DirtyRegion
+from lyric_timeline import LyricTimeline
+from frame_profiler import FrameProfiler
+from lyric_timings import TimingFile, timings_path_for
+from audio_clock import AudioClock
+from renderer import Renderer
+from pixel_effects import PixelEffects
+from quality_governor import QualityGovernor
+from effect_graph import EffectGraph, EffectState
+from render_cache import LayerLRU, RenderCache, cache_key, scene_fingerprint, DEFAULT_RENDER_CACHE_MB
+from render_profiles import SceneScale, draw_size
+
+# Offline renders run without a window or audio device
+if offline_render.wants_offline():
+    offline_render.use_headless_drivers()
+
+# Constants; the scene is laid out at DESIGN_SIZE, and pixel sizes are design pixels drawn through scene()
+DESIGN_SIZE = (1280, 720)
+WIDTH, HEIGHT = DESIGN_SIZE
+scene = SceneScale(DESIGN_SIZE)
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 RED = (255, 0, 0)
@@ -20,14 +43,15 @@ IMAGE_CONTAINER_HEIGHT = 200
 LYRIC_FONT_SIZE = 48
 AGGRESSIVE_TEXT_SIZE = 74
 TIMER_FONT_SIZE = 24
+MARK_FONT_SIZE = 36
 DEFAULT_IMAGE_PATH = 'boxing_glove.png'  # Path to default image
 
-# Setup display and fonts
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Enhanced Taylor Made Freestyle - Drake Lyric Video")
-font = pygame.font.Font(None, 36)
-lyric_font = pygame.font.Font(None, LYRIC_FONT_SIZE)
-timer_font = pygame.font.Font(None, TIMER_FONT_SIZE)
+# Display, mixer and song are set up on first use, so importing this module stays cheap;
+# fonts come from the text cache
+audio_file = 'FamilyMatters.mp3'
+renderer = Renderer((WIDTH, HEIGHT), "Enhanced Taylor Made Freestyle - Drake Lyric Video", audio_file)
+pixel_effects = PixelEffects()  # tint, zoom and fade buffers kept between frames
+profiler = FrameProfiler()
 
 # Lyrics
 lyrics = [
@@ -41,71 +65,88 @@ lyrics = [
     "Then come get his legacy out of my house"
 ]
 
-# Load audio
-audio_file = 'FamilyMatters.mp3'
-pygame.mixer.music.load(audio_file)
-audio = MP3(audio_file)
-TOTAL_DURATION = audio.info.length
-
-# Update the image_files list to include 'kendrick_silhouette.png'
-image_files = ['megaphone.png', 'megaphone.png', 'megaphone.png', 'megaphone.png', 'megaphone.png',
-               'megaphone.png', 'megaphone.png', 'megaphone.png', 'megaphone.png', 'megaphone.png', 'megaphone.png']
-images = {}
-
-# Update the load_image function
-def load_image(image_path):
-    try:
-        image = pygame.image.load(image_path)
-    except (pygame.error, FileNotFoundError): 
-        print(f"File '{image_path}' not found. Creating a placeholder image.")
-        image = pygame.Surface((IMAGE_CONTAINER_WIDTH, IMAGE_CONTAINER_HEIGHT))
-        image.fill((128, 128, 128))  # Fill with gray color
-        font = pygame.font.Font(None, 24)
-        text = font.render("Placeholder", True, (255, 255, 255))
-        image.blit(text, (10, IMAGE_CONTAINER_HEIGHT // 2 - 12))
-    return pygame.transform.scale(image, (IMAGE_CONTAINER_WIDTH, IMAGE_CONTAINER_HEIGHT))
-
-# Update the load_images function
-def load_images():
-    for file in image_files:
-        name = file.split('.')[0]
-        if os.path.exists(file):
-            images[name] = load_image(file)
-        else:
-            print(f"File '{file}' not found. Creating a placeholder image.")
-            placeholder = pygame.Surface((IMAGE_CONTAINER_WIDTH, IMAGE_CONTAINER_HEIGHT))
-            placeholder.fill((128, 128, 128))  # Fill with gray color
-            font = pygame.font.Font(None, 24)
-            text = font.render(name, True, (255, 255, 255))
-            placeholder.blit(text, (10, IMAGE_CONTAINER_HEIGHT // 2 - 12))
-            images[name] = placeholder
+SEEK_STEP = 5  # seconds
+SCRUB_STEP = 0.5  # seconds
+LYRIC_SNAP_WINDOW = 0.25  # seconds a lyric start may move to land on an onset
+preset_marked_lyrics = None  # (time, lyric) pairs given by configure(), used instead of tapping
+MARK_PREROLL = 3  # seconds of audio played before the first line being re-marked
+
+# Every image the effects ask for; names without a file on disk get a placeholder
+IMAGE_SOURCES = {
+    'megaphone': 'megaphone.png',
+    'grammy': 'grammy.png',
+    'boxing_glove': 'boxing_glove.png',
+    'kendrick_silhouette': 'kendrick_silhouette.png',
+    'search_light': 'search_light.png',
+    'house': 'house.png',
+    'clippers': 'clippers.png',
+    'pharrell_hat': 'pharrell_hat.png',
+    'ovo_owl': 'ovo_owl.png',
+}
+# Which image effect plays on which line, loaded on first draw (see effect_graph.py)
+EFFECT_GRAPH_FILE = 'FamilyMatters.effects.json'
+# Files besides the song that frames are drawn from
+SCENE_FILES = [EFFECT_GRAPH_FILE, *IMAGE_SOURCES.values()]
+# Text, images and sprites are built for one size; each size keeps its own, so a process
+# switching between render profiles reuses them
+profile_caches = {}
+
+def caches_for(size):
+    caches = profile_caches.get(tuple(size))
+    if caches is None:
+        # Images are decoded lazily on first use at the scaled container size, deduplicated by
+        # content and cached on disk between runs; the atlas builds their rotated/scaled variants
+        # on first use instead of every frame
+        assets = AssetManager(IMAGE_SOURCES, (scene(IMAGE_CONTAINER_WIDTH), scene(IMAGE_CONTAINER_HEIGHT)))
+        caches = profile_caches[tuple(size)] = (TextCache(), assets, SpriteAtlas(assets))
+    return caches
+
+text_cache, images, sprites = caches_for((WIDTH, HEIGHT))
+# Zoomed, tinted lines by what sets their pixels, kept across sizes (the text size is part of the key)
+text_layers = LayerLRU()
+
+PARTICLE_LIFE = 255
+PARTICLE_DECAY = 2  # life lost per frame
+PARTICLE_SHRINK = 0.05  # size lost per frame
+PARTICLES_PER_FRAME = 5
+PARTICLE_LIMIT = 100000  # hard cap on the pool, so memory stays bounded however long the song
+particles = ParticleSystem([RED, GOLD, WHITE], limit=PARTICLE_LIMIT)
+particle_rng = np.random.default_rng()
+
+BACKGROUND_CELL = 40
+# (cheapest, full) bounds of the effects the governor trades for frame time during playback;
+# full quality is the original look and what offline renders use unless --quality says otherwise
+QUALITY_KNOBS = {
+    'particles': (1, PARTICLES_PER_FRAME),  # spawned per frame
+    'grid_cell': (BACKGROUND_CELL * 2, BACKGROUND_CELL),  # background grid spacing in pixels
+    'gloves': (3, 8),  # gloves on screen at the loudest moments
+    'transition_resolution': (0.5, 1.0),  # fraction of the screen size the zoom works at
+}
+quality = QualityGovernor(QUALITY_KNOBS)
 
 # Update the create_particle function
-def create_particle(x, y):
-    return {
-        'x': x,
-        'y': y,
-        'x_vel': random.uniform(-1, 1),
-        'y_vel': random.uniform(-1, 1),
-        'size': random.randint(1, 4),
-        'color': random.choice([RED, GOLD, WHITE]),
-        'life': 255
-    }
+def create_particles(count, rng):
+    particles.spawn(
+        x=rng.integers(0, WIDTH, count, endpoint=True),
+        y=rng.integers(0, HEIGHT, count, endpoint=True),
+        vx=rng.uniform(-scene(1), scene(1), count),
+        vy=rng.uniform(-scene(1), scene(1), count),
+        life=np.full(count, PARTICLE_LIFE),
+        size=rng.integers(scene(1), scene(4), count, endpoint=True),
+        color=rng.integers(0, len(particles.palette), count),
+    )
+
+def step_particles(rng=None):
+    rng = particle_rng if rng is None else rng
+    create_particles(quality.value('particles'), rng)
+    particles.step(PARTICLE_DECAY, scene(PARTICLE_SHRINK))
 
 # Update the draw_particles function
 def draw_particles(surface):
-    for particle in particles:
-        particle['x'] += particle['x_vel']
-        particle['y'] += particle['y_vel']
-        particle['size'] -= 0.05
-        particle['life'] -= 2
-        if particle['life'] > 0:
-            color = particle['color'] + (particle['life'],)
-            pygame.draw.circle(surface, color, (int(particle['x']), int(particle['y'])), int(particle['size']))
+    particles.draw(surface)
 
 def create_aggressive_text(text):
-    font = pygame.font.Font(None, AGGRESSIVE_TEXT_SIZE)
-    return font.render(text, True, RED)
+    return text_cache.render(text, scene(AGGRESSIVE_TEXT_SIZE), RED)
 
 def draw_shaking_text(surface, text, pos, shake_amount):
     x, y = pos
@@ -113,51 +154,59 @@ def draw_shaking_text(surface, text, pos, shake_amount):
     y += random.randint(-shake_amount, shake_amount)
     surface.blit(text, (x, y))
 
+def effect_level(current_time, low, high):
+    # Scale an effect between low and high with the track's energy at this moment
+    return int(round(low + (high - low) * renderer.cues.intensity_at(current_time)))
+
 def draw_cracking_screen(surface, intensity):
     for _ in range(intensity):
         x1, y1 = random.randint(0, WIDTH), random.randint(0, HEIGHT)
-        x2, y2 = x1 + random.randint(-100, 100), y1 + random.randint(-100, 100)
-        pygame.draw.line(surface, WHITE, (x1, y1), (x2, y2), 2)
+        x2, y2 = x1 + random.randint(-scene(100), scene(100)), y1 + random.randint(-scene(100), scene(100))
+        pygame.draw.line(surface, WHITE, (x1, y1), (x2, y2), scene(2))
 
-def draw_pulsating_silhouette(surface, image):
-    t = pygame.time.get_ticks() / 1000
-    size = int(200 + math.sin(t * 5) * 20)
-    resized_image = pygame.transform.scale(image, (size, size))
+def draw_pulsating_silhouette(surface, image_name, current_time, speed=5, base_size=200, amount=20):
+    t = current_time
+    size = int(scene(base_size) + math.sin(t * speed) * scene(amount))
+    resized_image = sprites.scale(image_name, (size, size))
     surface.blit(resized_image, (WIDTH // 2 - size // 2, HEIGHT // 2 - size // 2))
 
-def draw_flying_grammy(surface, progress):
+def draw_flying_image(surface, image_name, progress):
     x = int(WIDTH * progress)
-    y = HEIGHT // 2 + int(math.sin(progress * 10) * 50)
-    rotated_grammy = pygame.transform.rotate(images['grammy'], progress * 360)
-    surface.blit(rotated_grammy, (x - rotated_grammy.get_width() // 2, y - rotated_grammy.get_height() // 2))
+    y = HEIGHT // 2 + int(math.sin(progress * 10) * scene(50))
+    rotated_image = sprites.rotate(image_name, progress * 360)
+    surface.blit(rotated_image, (x - rotated_image.get_width() // 2, y - rotated_image.get_height() // 2))
 
-def draw_boxing_gloves(surface, intensity):
+def draw_scattered_images(surface, image_name, intensity):
     for _ in range(intensity):
         x = random.randint(0, WIDTH)
         y = random.randint(0, HEIGHT)
         angle = random.uniform(0, 360)
-        rotated_glove = pygame.transform.rotate(images['boxing_glove'], angle)
-        surface.blit(rotated_glove, (x, y))
+        rotated_image = sprites.rotate(image_name, angle)
+        surface.blit(rotated_image, (x, y))
 
 def draw_timers(screen, current_time, next_lyric_time, total_duration):
     elapsed_time = f"Elapsed Time: {current_time:.2f}s"
     time_to_next = f"Time to Next Lyric: {max(0, next_lyric_time - current_time):.2f}s"
     time_remaining = f"Time Remaining: {max(0, total_duration - current_time):.2f}s"
 
+    timer_font = text_cache.font(scene(TIMER_FONT_SIZE))
     elapsed_text = timer_font.render(elapsed_time, True, WHITE)
     next_text = timer_font.render(time_to_next, True, WHITE)
     remaining_text = timer_font.render(time_remaining, True, WHITE)
 
-    screen.blit(elapsed_text, (10, 10))
-    screen.blit(next_text, (10, 40))
-    screen.blit(remaining_text, (10, 70))
+    screen.blit(elapsed_text, (scene(10), scene(10)))
+    screen.blit(next_text, (scene(10), scene(40)))
+    screen.blit(remaining_text, (scene(10), scene(70)))
 
-def mark_lyrics():
+def mark_lyrics(pending=None, start=0.0):
+    # Tap SPACE at the start of each pending lyric, playing the track from start seconds
+    screen = renderer.screen
+    font = text_cache.font(scene(MARK_FONT_SIZE))
     clock = pygame.time.Clock()
-    pygame.mixer.music.play()
+    pygame.mixer.music.play(start=start)
     start_time = pygame.time.get_ticks()
     marked_lyrics = []
-    remaining_lyrics = lyrics.copy()
+    remaining_lyrics = list(lyrics if pending is None else pending)
 
     running = True
     while running and remaining_lyrics:
@@ -166,7 +215,7 @@ def mark_lyrics():
                 running = False
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    current_time = (pygame.time.get_ticks() - start_time) / 1000
+                    current_time = start + (pygame.time.get_ticks() - start_time) / 1000
                     marked_lyrics.append((current_time, remaining_lyrics.pop(0)))
 
         screen.fill(BLACK)
@@ -174,12 +223,12 @@ def mark_lyrics():
         # Display remaining lyrics
         for i, lyric in enumerate(remaining_lyrics):
             text = font.render(lyric, True, WHITE)
-            screen.blit(text, (50, 100 + i * 40))
+            screen.blit(text, (scene(50), scene(100) + i * scene(40)))
 
         # Display current time
-        current_time = (pygame.time.get_ticks() - start_time) / 1000
+        current_time = start + (pygame.time.get_ticks() - start_time) / 1000
         time_text = font.render(f"Current Time: {current_time:.2f}s", True, WHITE)
-        screen.blit(time_text, (50, 50))
+        screen.blit(time_text, (scene(50), scene(50)))
 
         pygame.display.flip()
         clock.tick(60)
@@ -187,259 +236,483 @@ def mark_lyrics():
     pygame.mixer.music.stop()
     return marked_lyrics
 
-def draw_visual_elements(screen, current_lyric_index, marked_lyrics, current_time):
-    lyric_time, lyric_text = marked_lyrics[current_lyric_index]
-    aggressive_text = create_aggressive_text(lyric_text)
-    text_x = WIDTH // 2 - aggressive_text.get_width() // 2
-    text_y = HEIGHT // 2 - aggressive_text.get_height() // 2
-    
-    # Calculate the progress of the current lyric
-    progress = (current_time - lyric_time) / 4  # Assuming each lyric lasts about 4 seconds
-    
-    # Apply a zoom-in effect to the text
-    zoom_factor = 1 + math.sin(progress * math.pi) * 0.2
-    zoomed_text = pygame.transform.scale(aggressive_text, 
-                                         (int(aggressive_text.get_width() * zoom_factor),
-                                          int(aggressive_text.get_height() * zoom_factor)))
-    
-    # Apply a color cycling effect
-    hue = (current_time * 0.1) % 1.0
-    color = [int(c * 255) for c in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
-    color_surface = pygame.Surface(zoomed_text.get_size(), pygame.SRCALPHA)
-    color_surface.fill(color + [128])  # Semi-transparent color overlay
-    zoomed_text.blit(color_surface, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-    
-    draw_shaking_text(screen, zoomed_text, (text_x, text_y), 5)
-
-    # Draw image directly under the text within a container
-    image_y = text_y + zoomed_text.get_height() + 10  # 10 pixels below the text
-    if "mouth" in lyric_text.lower():
-        if "kendrick" in lyric_text.lower():
-            draw_pulsating_silhouette(screen, images['kendrick_silhouette'])
-        else:
-            image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-            rotated_megaphone = pygame.transform.rotate(images['megaphone'], math.sin(current_time * 5) * 15)
-            screen.blit(rotated_megaphone, (image_x, image_y))
-    elif "grammy" in lyric_text.lower():
-        draw_flying_grammy(screen, progress)
-    elif "uncle" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['search_light'].get_width() // 2
-        scaled_searchlight = pygame.transform.scale(images['search_light'], 
-                                                    (int(IMAGE_CONTAINER_WIDTH * (1 + math.sin(current_time * 3) * 0.2)),
-                                                     int(IMAGE_CONTAINER_HEIGHT * (1 + math.sin(current_time * 3) * 0.2))))
-        screen.blit(scaled_searchlight, (image_x, image_y))
-    elif "man of the house" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['house'].get_width() // 2
-        house_shake = math.sin(current_time * 10) * 5
-        screen.blit(images['house'], (image_x + house_shake, image_y))
-    elif "fades" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['clippers'].get_width() // 2
-        rotated_clippers = pygame.transform.rotate(images['clippers'], current_time * 180)
-        screen.blit(rotated_clippers, (image_x, image_y))
-    elif "ass whoopin'" in lyric_text.lower():
-        draw_boxing_gloves(screen, 5)
-    elif "pharrell" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['pharrell_hat'].get_width() // 2
-        hat_bounce = math.sin(current_time * 5) * 20
-        screen.blit(images['pharrell_hat'], (image_x, image_y + hat_bounce))
-    elif "legacy" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['ovo_owl'].get_width() // 2
-        owl_scale = 1 + math.sin(current_time * 2) * 0.1
-        scaled_owl = pygame.transform.scale(images['ovo_owl'], 
-                                            (int(IMAGE_CONTAINER_WIDTH * owl_scale),
-                                             int(IMAGE_CONTAINER_HEIGHT * owl_scale)))
-        screen.blit(scaled_owl, (image_x, image_y))
+def load_marked_lyrics(path=None, remark=False):
+    # Reuse saved taps; only lines that are new or edited since the last save get re-marked
+    audio_path = renderer.audio_path
+    timings = TimingFile(path or timings_path_for(audio_path), renderer.audio_hash, lyrics)
+    if remark:
+        timings.remark()
+    print(timings.describe())
+
+    for run in timings.missing_runs():
+        # Start a little before the run so there is time to get ready for the first tap
+        previous = timings.times[run[0] - 1] if run[0] > 0 else 0.0
+        start = max(0.0, previous - MARK_PREROLL)
+        marked = mark_lyrics([lyrics[i] for i in run], start)
+        for i, (lyric_time, _) in zip(run, marked):
+            timings.set(i, lyric_time)
+        if len(marked) < len(run):
+            break  # Window closed mid-run
+
+    if timings.changed:
+        # A run cut short by closing the window still keeps the lines tapped so far
+        timings.save()
+        print(f"Saved timings to '{timings.path}' ({len(lyrics) - len(timings.missing())}/{len(lyrics)} lines marked)")
+    return timings.timed_lyrics()
+
+def default_marked_lyrics(total_duration):
+    # Offline renders can't tap SPACE: use preset or saved taps when they cover every line,
+    # otherwise spread the lyrics evenly over the track, then snap to onsets
+    timings = TimingFile(timings_path_for(renderer.audio_path), renderer.audio_hash, lyrics)
+    if preset_marked_lyrics is not None:
+        marked_lyrics = preset_marked_lyrics
+    elif timings.complete():
+        marked_lyrics = timings.timed_lyrics()
+    else:
+        step = total_duration / len(lyrics)
+        marked_lyrics = [(i * step, lyric) for i, lyric in enumerate(lyrics)]
+    return renderer.cues.snap_lyrics(marked_lyrics, LYRIC_SNAP_WINDOW)
+
+def draw_frame(screen, current_time, timeline, particle_rng=None, dirty=None):
+    screen.fill(BLACK)
+
+    # The active line is looked up from the time alone, so seeking just works
+    lyric = timeline.state_at(current_time)
+    if lyric.text is not None:
+        with profiler.stage('visual_elements'):
+            effect_state = draw_visual_elements(screen, lyric, timeline, current_time)
+        
+        # Transition effect
+        with profiler.stage('transition'):
+            effects_for(timeline).draw('transition', lyric.index, screen, effect_state)
 
-def transition_effect(screen, progress):
-    radius = int((1 - progress) * math.sqrt(WIDTH**2 + HEIGHT**2))
-    pygame.draw.circle(screen, BLACK, (WIDTH // 2, HEIGHT // 2), radius)
+    with profiler.stage('cracks'):
+        draw_cracking_screen(screen, effect_level(current_time, 4, 16))
+    
+    with profiler.stage('particles'):
+        step_particles(particle_rng)
+        draw_particles(screen)
 
-def main():
-    global particles  # Make particles global so we can modify it
-    marked_lyrics = mark_lyrics()
-    particles = []  # Initialize particles list
+    with profiler.stage('timers'):
+        draw_timers(screen, current_time, lyric.next_time, renderer.duration)
+
+    # Add a background effect
+    with profiler.stage('background_effect'):
+        changed = draw_background_effect(screen, current_time)
+    if dirty is not None:
+        # Everything else sits under the full-screen grid, so its rect covers the whole frame
+        dirty.add(changed)
+
+def main(dirty_rects=False, dirty_threshold=0.75, drift_histogram=False, auto_timings=False,
+         timings_path=None, remark=False, profile_out=None, quality_level=None, min_quality=0.0):
+    screen = renderer.screen
+    if quality_level is not None:
+        quality.pin(quality_level)
+    else:
+        quality.min_quality = min_quality
+    if auto_timings:
+        marked_lyrics = default_marked_lyrics(renderer.duration)
+    else:
+        # Taps land a little late or early; pull them onto the nearest onset
+        marked_lyrics = renderer.cues.snap_lyrics(load_marked_lyrics(timings_path, remark), LYRIC_SNAP_WINDOW)
+    timeline = LyricTimeline(marked_lyrics, renderer.duration)
+    particles.clear()
 
     clock = pygame.time.Clock()
+    dirty = DirtyRegion((WIDTH, HEIGHT), dirty_threshold) if dirty_rects else None
     pygame.mixer.music.play()
-    start_time = pygame.time.get_ticks()
-    current_lyric_index = 0
+    # Visuals follow the audio position rather than a separately started timer
+    playback = AudioClock()
 
     running = True
     while running:
+        frame_start = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-
-        current_time = (pygame.time.get_ticks() - start_time) / 1000
-        screen.fill(BLACK)
-
-        if current_lyric_index < len(marked_lyrics):
-            lyric_time, lyric_text = marked_lyrics[current_lyric_index]
-            if current_time >= lyric_time:
-                draw_visual_elements(screen, current_lyric_index, marked_lyrics, current_time)
-                
-                # Transition effect
-                if current_lyric_index + 1 < len(marked_lyrics):
-                    next_lyric_time = marked_lyrics[current_lyric_index + 1][0]
-                    transition_progress = (current_time - lyric_time) / (next_lyric_time - lyric_time)
-                    if transition_progress > 0.8:  # Start transition at 80% of lyric duration
-                        transition_effect(screen, (transition_progress - 0.8) * 5)  # Scale to 0-1 range
-                
-                if current_lyric_index + 1 < len(marked_lyrics) and current_time >= marked_lyrics[current_lyric_index + 1][0]:
-                    current_lyric_index += 1
-
-        draw_cracking_screen(screen, 10)
-        
-        for _ in range(5):
-            particles.append(create_particle(random.randint(0, WIDTH), random.randint(0, HEIGHT)))
-        draw_particles(screen)
-        particles[:] = [p for p in particles if p['life'] > 0]
-
-        next_lyric_time = TOTAL_DURATION
-        if current_lyric_index < len(marked_lyrics) - 1:
-            next_lyric_time = marked_lyrics[current_lyric_index + 1][0]
-
-        draw_timers(screen, current_time, next_lyric_time, TOTAL_DURATION)
-
-        # Add a background effect
-        draw_background_effect(screen, current_time)
-
-        pygame.display.flip()
+            elif event.type == pygame.KEYDOWN:
+                # LEFT/RIGHT seek, COMMA/PERIOD scrub in small steps, HOME restarts
+                if event.key == pygame.K_LEFT:
+                    playback.scrub(-SEEK_STEP, renderer.duration)
+                elif event.key == pygame.K_RIGHT:
+                    playback.scrub(SEEK_STEP, renderer.duration)
+                elif event.key == pygame.K_COMMA:
+                    playback.scrub(-SCRUB_STEP, renderer.duration)
+                elif event.key == pygame.K_PERIOD:
+                    playback.scrub(SCRUB_STEP, renderer.duration)
+                elif event.key == pygame.K_HOME:
+                    playback.seek(0)
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+
+        current_time = playback.time()
+        draw_frame(screen, current_time, timeline, dirty=dirty)
+        renderer.frame_drawn()
+        overlay = profiler.draw_overlay(screen, text_cache.font(scene(TIMER_FONT_SIZE)))
+        if dirty is not None:
+            dirty.add(overlay)
+
+        with profiler.stage('present'):
+            if dirty is not None:
+                dirty.present()
+            else:
+                pygame.display.flip()
+        # The governor sees the work done this frame, not the time tick() sleeps
+        quality.frame(time.perf_counter() - frame_start)
         clock.tick(60)
+        profiler.end_frame()
 
-        if current_time >= TOTAL_DURATION or not pygame.mixer.music.get_busy():
+        if current_time >= renderer.duration or not pygame.mixer.music.get_busy():
             running = False
 
+    if dirty is not None:
+        print(dirty.describe())
+    print(playback.drift.describe(histogram=drift_histogram))
+    print(quality.describe())
+    print(renderer.describe_startup())
+    report_profile(profile_out)
     pygame.mixer.music.stop()
     pygame.quit()
 
+def set_resolution(size):
+    # Rebind the size-dependent globals so every draw function renders at size, with the
+    # scene scaled from its design size and the text, image and sprite caches of that size
+    global WIDTH, HEIGHT, text_cache, images, sprites
+    WIDTH, HEIGHT = size
+    renderer.set_resolution(size)
+    scene.resize(size)
+    # Variants are cheap to rebuild; only the active size's count against the memory budget
+    sprites.clear()
+    text_cache, images, sprites = caches_for(size)
+    background_grids.clear()
+    particles.clear()
+
+def configure(audio_path=audio_file, timed_lyrics=None, size=(WIDTH, HEIGHT), song_lyrics=tuple(lyrics)):
+    # Switch song, lyrics and size so one process can render several songs (batch renders);
+    # the defaults are this script's own song, bound when the module loads. Without
+    # timed_lyrics the song's lyrics are timed as in a normal offline render
+    global lyrics, preset_marked_lyrics
+    if audio_path != renderer.audio_path:
+        renderer.load_song(audio_path)
+    if timed_lyrics is None:
+        lyrics = list(song_lyrics)
+        preset_marked_lyrics = None
+    else:
+        lyrics = [text for _, text in timed_lyrics]
+        preset_marked_lyrics = list(timed_lyrics)
+    if size != (WIDTH, HEIGHT):
+        set_resolution(size)
+
+# Finished frames reused between renders (--render-cache), one cache per process
+render_cache = None
+scene_fingerprints = {}
+
+def frame_cache(directory, budget_mb=DEFAULT_RENDER_CACHE_MB):
+    global render_cache
+    if directory is None:
+        return None
+    if render_cache is None or render_cache.directory != directory:
+        render_cache = RenderCache(directory, budget_mb)
+    return render_cache
+
+def song_fingerprint():
+    fingerprint = scene_fingerprints.get(renderer.audio_path)
+    if fingerprint is None:
+        fingerprint = scene_fingerprint(sys.modules[__name__], [renderer.audio_path, *SCENE_FILES])
+        scene_fingerprints[renderer.audio_path] = fingerprint
+    return fingerprint
+
+def frame_key(frame_index, fps, timeline):
+    # A frame is fixed by the code, the song (its cues drive the effects) and size, the quality,
+    # its index (which seeds every random effect and the particles) and the lyrics around it
+    fingerprint = song_fingerprint()
+    lyric = timeline.state_at(frame_index / fps)
+    previous_text = timeline[lyric.index - 1][1] if lyric.index > 0 else None
+    return cache_key(fingerprint, WIDTH, HEIGHT, fps, frame_index, renderer.duration, quality.quality,
+                     tuple(lyric), previous_text)
+
+def frame_keys(start_frame, end_frame, fps, quality_level=1.0):
+    quality.pin(quality_level)
+    timeline = LyricTimeline(default_marked_lyrics(renderer.duration), renderer.duration)
+    for frame_index in range(start_frame, end_frame):
+        yield frame_key(frame_index, fps, timeline)
+
+def render_range(start_frame, end_frame, fps, quality_level=1.0, cache_dir=None, cache_mb=DEFAULT_RENDER_CACHE_MB,
+                 size=None):
+    # Worker processes start at the design size and switch to the size the render draws at
+    if size is not None and tuple(size) != (WIDTH, HEIGHT):
+        set_resolution(size)
+    # A pinned quality keeps every frame, and so every chunk, the same from run to run
+    quality.pin(quality_level)
+    timeline = LyricTimeline(default_marked_lyrics(renderer.duration), renderer.duration)
+
+    # Rebuild the particles that would still be alive at start_frame so any chunk
+    # of the timeline renders exactly as it would in one sequential pass
+    particles.clear()
+    warmup_frames = PARTICLE_LIFE // PARTICLE_DECAY + 1
+    for frame_index in range(max(0, start_frame - warmup_frames), start_frame):
+        step_particles(offline_render.frame_rng(frame_index, 'particles'))
+
+    screen = renderer.screen
+    cache = frame_cache(cache_dir, cache_mb)
+    if cache is not None:
+        # Text layers pushed out of memory go to the cache directory rather than being redrawn
+        text_layers.spill_to(cache, song_fingerprint())
+    for frame_index in range(start_frame, end_frame):
+        offline_render.seed_frame(frame_index)
+        rng = offline_render.frame_rng(frame_index, 'particles')
+        cached = key = None
+        if cache is not None:
+            key = frame_key(frame_index, fps, timeline)
+            cached = cache.get(key, (WIDTH, HEIGHT))
+        if cached is not None:
+            # Particles carry over to later frames, so they advance even when the frame is reused
+            step_particles(rng)
+            screen.blit(cached, (0, 0))
+        else:
+            draw_frame(screen, frame_index / fps, timeline, rng)
+            if cache is not None:
+                cache.put(key, screen)
+        renderer.frame_drawn()
+        profiler.end_frame()
+        yield frame_index, screen
+
+def report_profile(profile_out=None):
+    if profiler.enabled:
+        print(profiler.describe())
+        if profile_out:
+            profiler.dump(profile_out)
+
+def render_offline(output, fps=60, duration=None, image_format='png', workers=1, chunk_seconds=2.0,
+                   profile_out=None, audio=True, quality_level=1.0, cache_dir=None,
+                   cache_mb=DEFAULT_RENDER_CACHE_MB, incremental=False, render_profile=None):
+    total_duration = renderer.duration if duration is None else min(duration, renderer.duration)
+    # Analyse once here so worker processes find the cue file instead of all writing it
+    renderer.load_cues()
+    # A render profile draws at its own size and writes frames resampled to its output size
+    output_size = (WIDTH, HEIGHT) if render_profile is None else render_profile.size
+    if render_profile is not None:
+        set_resolution(draw_size(render_profile))
+    frames = functools.partial(render_range, quality_level=quality_level, cache_dir=cache_dir, cache_mb=cache_mb,
+                               size=(WIDTH, HEIGHT))
+    stats = offline_render.render_offline(frames, output_size, total_duration, fps, output,
+                                          image_format, workers, chunk_seconds,
+                                          renderer.audio_path if audio else None,
+                                          functools.partial(frame_keys, quality_level=quality_level)
+                                          if incremental else None)
+    if workers == 1:
+        print(text_cache.describe())
+        print(text_layers.describe())
+        print(sprites.describe())
+        print(images.describe())
+        if render_cache is not None:
+            print(render_cache.describe())
+        print(renderer.describe_startup())
+        report_profile(profile_out)
+    pygame.quit()
+    return stats
 
 
+
+background_grids = {}  # cell size -> (OutlineGrid, columns, rows) for the current size, built on first draw
+
 def draw_background_effect(screen, current_time):
-    # Create a dynamic background effect
-    for i in range(0, WIDTH, 40):
-        for j in range(0, HEIGHT, 40):
-            color = [(math.sin(current_time + i * 0.01) + 1) / 2 * 255,
-                     (math.cos(current_time + j * 0.01) + 1) / 2 * 255,
-                     (math.sin(current_time * 0.5) + 1) / 2 * 255]
-            pygame.draw.rect(screen, color, (i, j, 40, 40), 1)
+    # Create a dynamic background effect: the grid geometry is cached, only the colours change
+    cell = scene(quality.value('grid_cell'))
+    if cell not in background_grids:
+        background_grids[cell] = (OutlineGrid((WIDTH, HEIGHT), cell),
+                                  np.arange(0, WIDTH, cell), np.arange(0, HEIGHT, cell))
+    background_grid, background_columns, background_rows = background_grids[cell]
+    red = (np.sin(current_time + background_columns * 0.01) + 1) / 2 * 255
+    green = (np.cos(current_time + background_rows * 0.01) + 1) / 2 * 255
+    blue = int((math.sin(current_time * 0.5) + 1) / 2 * 255)
+    background_grid.draw(screen, red, green, blue)
+    # The grid spans the whole screen and recolours every frame
+    return screen.get_rect()
+
+def transition_drops(old_text, new_text, progress, height):
+    # How far each old character has fallen out and each new one has still to fall in, None
+    # for characters not drawn; with the two lines, these fix the transition's pixels
+    old_drops = []
+    for i in range(len(old_text)):
+        char_progress = max(0, min(1, (progress - i/len(old_text)) * len(old_text)))
+        old_drops.append(int(char_progress * height) if char_progress < 1 else None)
+    new_drops = []
+    for i in range(len(new_text)):
+        char_progress = max(0, min(1, (progress - i/len(new_text)) * len(new_text)))
+        new_drops.append(int((1-char_progress) * height) if char_progress > 0 else None)
+    return tuple(old_drops), tuple(new_drops)
+
+def transition_state(old_text, new_text, progress):
+    # Key and size of the surface create_lyric_transition() (or, without an old line,
+    # create_aggressive_text()) returns, worked out without drawing it
+    text_size = scene(AGGRESSIVE_TEXT_SIZE)
+    new_surface = text_cache.render(new_text, text_size, RED)
+    if old_text is None or progress >= 1:
+        return (new_text, text_size), new_surface.get_size()
+    old_surface = text_cache.render(old_text, text_size, RED)
+    height = old_surface.get_height()
+    drops = transition_drops(old_text, new_text, progress, height)
+    return (old_text, new_text, text_size, drops), (max(old_surface.get_width(), new_surface.get_width()), height)
 
 def create_lyric_transition(old_text, new_text, progress):
-    font = pygame.font.Font(None, AGGRESSIVE_TEXT_SIZE)
-    old_surface = font.render(old_text, True, RED)
-    new_surface = font.render(new_text, True, RED)
+    text_size = scene(AGGRESSIVE_TEXT_SIZE)
+    new_surface = text_cache.render(new_text, text_size, RED)
+    if progress >= 1:
+        # Every new character has landed: the cached line looks the same and needs no per-character blits
+        return new_surface
+    old_surface = text_cache.render(old_text, text_size, RED)
+    # Characters sit at their measured advances (with kerning), cached per line
+    old_x = text_cache.layout(old_text, text_size).x
+    new_x = text_cache.layout(new_text, text_size).x
+    old_drops, new_drops = transition_drops(old_text, new_text, progress, old_surface.get_height())
     
     transition_surface = pygame.Surface((max(old_surface.get_width(), new_surface.get_width()),
                                          old_surface.get_height()), pygame.SRCALPHA)
     
-    for i in range(len(old_text)):
-        char_progress = max(0, min(1, (progress - i/len(old_text)) * len(old_text)))
-        if char_progress < 1:
-            char_surface = font.render(old_text[i], True, RED)
-            transition_surface.blit(char_surface, (i * AGGRESSIVE_TEXT_SIZE // 2, int(char_progress * old_surface.get_height())))
+    for i, drop in enumerate(old_drops):
+        if drop is not None:
+            char_surface = text_cache.render(old_text[i], text_size, RED)
+            transition_surface.blit(char_surface, (int(old_x[i]), drop))
     
-    for i in range(len(new_text)):
-        char_progress = max(0, min(1, (progress - i/len(new_text)) * len(new_text)))
-        if char_progress > 0:
-            char_surface = font.render(new_text[i], True, RED)
-            transition_surface.blit(char_surface, (i * AGGRESSIVE_TEXT_SIZE // 2, int((1-char_progress) * old_surface.get_height())))
+    for i, drop in enumerate(new_drops):
+        if drop is not None:
+            char_surface = text_cache.render(new_text[i], text_size, RED)
+            transition_surface.blit(char_surface, (int(new_x[i]), drop))
     
     return transition_surface
 
-def draw_visual_elements(screen, current_lyric_index, marked_lyrics, current_time):
-    lyric_time, lyric_text = marked_lyrics[current_lyric_index]
+def draw_visual_elements(screen, lyric, marked_lyrics, current_time):
+    lyric_time, lyric_text = lyric.start, lyric.text
     
     # Calculate the progress of the current lyric
     progress = (current_time - lyric_time) / 4  # Assuming each lyric lasts about 4 seconds
     
     # Create transitioning text
-    if current_lyric_index > 0:
-        prev_lyric_text = marked_lyrics[current_lyric_index - 1][1]
-        transitioning_text = create_lyric_transition(prev_lyric_text, lyric_text, progress)
-    else:
-        transitioning_text = create_aggressive_text(lyric_text)
+    prev_lyric_text = marked_lyrics[lyric.index - 1][1] if lyric.index > 0 else None
+    text_state, (text_width, text_height) = transition_state(prev_lyric_text, lyric_text, progress)
     
-    text_x = WIDTH // 2 - transitioning_text.get_width() // 2
-    text_y = HEIGHT // 2 - transitioning_text.get_height() // 2
+    text_x = WIDTH // 2 - text_width // 2
+    text_y = HEIGHT // 2 - text_height // 2
     
     # Apply a zoom-in effect to the text
     zoom_factor = 1 + math.sin(progress * math.pi) * 0.2
-    zoomed_text = pygame.transform.scale(transitioning_text, 
-                                         (int(transitioning_text.get_width() * zoom_factor),
-                                          int(transitioning_text.get_height() * zoom_factor)))
+    zoomed_size = (int(text_width * zoom_factor), int(text_height * zoom_factor))
     
     # Apply a color cycling effect
     hue = (current_time * 0.1) % 1.0
     color = [int(c * 255) for c in colorsys.hsv_to_rgb(hue, 1.0, 1.0)]
-    color_surface = pygame.Surface(zoomed_text.get_size(), pygame.SRCALPHA)
-    color_surface.fill(color + [128])  # Semi-transparent color overlay
-    zoomed_text.blit(color_surface, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
-    
-    draw_shaking_text(screen, zoomed_text, (text_x, text_y), 5)
+    # Multiplying red text leaves only the tint's red channel, so the key drops the other two
+    # and the line is reused for the third of the cycle the red stays at 255
+    tint = tuple(c if base else 0 for c, base in zip(color, RED))
 
-    # Draw image directly under the text within a container
-    image_y = text_y + zoomed_text.get_height() + 10  # 10 pixels below the text
-    if "mouth" in lyric_text.lower():
-        if "kendrick" in lyric_text.lower():
-            draw_pulsating_silhouette(screen, images['megaphone'])
+    def draw_text(layer):
+        if prev_lyric_text is not None:
+            transitioning_text = create_lyric_transition(prev_lyric_text, lyric_text, progress)
         else:
-            image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-            rotated_megaphone = pygame.transform.rotate(images['megaphone'], math.sin(current_time * 5) * 15)
-            screen.blit(rotated_megaphone, (image_x, image_y))
-    elif "grammy" in lyric_text.lower():
-        draw_flying_grammy(screen, progress)
-    elif "uncle" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-        scaled_searchlight = pygame.transform.scale(images['megaphone'], 
-                                                    (int(IMAGE_CONTAINER_WIDTH * (1 + math.sin(current_time * 3) * 0.2)),
-                                                     int(IMAGE_CONTAINER_HEIGHT * (1 + math.sin(current_time * 3) * 0.2))))
-        screen.blit(scaled_searchlight, (image_x, image_y))
-    elif "man of the house" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-        house_shake = math.sin(current_time * 10) * 5
-        screen.blit(images['megaphone'], (image_x + house_shake, image_y))
-    elif "fades" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-        rotated_clippers = pygame.transform.rotate(images['megaphone'], current_time * 180)
-        screen.blit(rotated_clippers, (image_x, image_y))
-    elif "ass whoopin'" in lyric_text.lower():
-        draw_boxing_gloves(screen, 5)
-    elif "pharrell" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-        hat_bounce = math.sin(current_time * 5) * 20
-        screen.blit(images['megaphone'], (image_x, image_y + hat_bounce))
-    elif "legacy" in lyric_text.lower():
-        image_x = WIDTH // 2 - images['megaphone'].get_width() // 2
-        owl_scale = 1 + math.sin(current_time * 2) * 0.1
-        scaled_owl = pygame.transform.scale(images['megaphone'], 
-                                            (int(IMAGE_CONTAINER_WIDTH * owl_scale),
-                                             int(IMAGE_CONTAINER_HEIGHT * owl_scale)))
-        screen.blit(scaled_owl, (image_x, image_y))
-
-    # Add a starburst effect
-    draw_starburst(screen, (WIDTH // 2, HEIGHT // 2), current_time)
-
-def draw_starburst(screen, center, current_time):
+            transitioning_text = create_aggressive_text(lyric_text)
+        zoomed_text = pygame.transform.scale(transitioning_text, zoomed_size)
+        pixel_effects.tint(zoomed_text, color + [128])  # Semi-transparent color overlay
+        layer.blit(zoomed_text, (0, 0))
+
+    zoomed_text = text_layers.get(('lyric', text_state, tint), zoomed_size, draw_text)
+    draw_shaking_text(screen, zoomed_text, (text_x, text_y), scene(5))
+
+    # Images go directly under the text; which ones is looked up per line, not matched per frame
+    image_y = text_y + zoomed_text.get_height() + scene(10)  # 10 design pixels below the text
+    state = EffectState(current_time, progress, image_y, lyric)
+    effects_for(marked_lyrics).draw('elements', lyric.index, screen, state)
+    return state
+
+def draw_starburst(screen, center, current_time, max_length=100):
     num_lines = 12
-    max_length = 100
     for i in range(num_lines):
         angle = i * (2 * math.pi / num_lines) + current_time
         length = abs(math.sin(current_time * 5)) * max_length
         end_pos = (center[0] + math.cos(angle) * length, center[1] + math.sin(angle) * length)
-        pygame.draw.line(screen, GOLD, center, end_pos, 2)
+        pygame.draw.line(screen, GOLD, center, end_pos, scene(2))
 
 def transition_effect(screen, progress):
     if progress < 0.5:
         # Zoom out effect
-        scale = 1 + progress * 2
-        scaled_screen = pygame.transform.scale(screen, (int(WIDTH * scale), int(HEIGHT * scale)))
-        screen.blit(scaled_screen, (-int(WIDTH * (scale - 1) / 2), -int(HEIGHT * (scale - 1) / 2)))
+        pixel_effects.zoom(screen, 1 + progress * 2, quality.value('transition_resolution'))
     else:
         # Fade to black effect
-        overlay = pygame.Surface((WIDTH, HEIGHT))
-        overlay.fill(BLACK)
-        overlay.set_alpha(int(255 * (progress - 0.5) * 2))
-        screen.blit(overlay, (0, 0))
+        pixel_effects.fade(screen, int(255 * (progress - 0.5) * 2))
+
+# Effect nodes the effect graph can name; each draws from an EffectState plus its rule's parameters
+def image_x(image_name):
+    return WIDTH // 2 - images[image_name].get_width() // 2
+
+def rotate_node(screen, state, image, speed=0, swing=0, spin=0):
+    angle = state.time * spin + math.sin(state.time * speed) * swing
+    screen.blit(sprites.rotate(image, angle), (image_x(image), state.below))
+
+def pulse_node(screen, state, image, speed, amount):
+    scale = 1 + math.sin(state.time * speed) * amount
+    width, height = images.size
+    scaled_image = sprites.scale(image, (int(width * scale), int(height * scale)))
+    screen.blit(scaled_image, (image_x(image), state.below))
+
+def shake_node(screen, state, image, speed, amount, axis='x'):
+    offset = math.sin(state.time * speed) * scene(amount)
+    x, y = image_x(image), state.below
+    if axis == 'x':
+        x += offset
+    else:
+        y += offset
+    screen.blit(images[image], (x, y))
+
+def silhouette_node(screen, state, image, speed=5, size=200, amount=20):
+    draw_pulsating_silhouette(screen, image, state.time, speed, size, amount)
+
+def fly_node(screen, state, image):
+    draw_flying_image(screen, image, state.progress)
+
+def scatter_node(screen, state, image, low, high=None, knob=None):
+    # knob names a quality knob that sets the count at the loudest moments instead of high
+    draw_scattered_images(screen, image, effect_level(state.time, low, quality.value(knob) if knob else high))
+
+def starburst_node(screen, state, low=50, high=150):
+    draw_starburst(screen, (WIDTH // 2, HEIGHT // 2), state.time, effect_level(state.time, scene(low), scene(high)))
+
+def transition_node(screen, state, after=0.8, rate=5):
+    # Starts once the line is `after` through and runs `rate` times as fast as the line
+    lyric = state.lyric
+    if lyric.next_index is not None and lyric.progress > after:
+        transition_effect(screen, (lyric.progress - after) * rate)
+
+effect_nodes = {
+    'rotate': rotate_node,
+    'pulse': pulse_node,
+    'shake': shake_node,
+    'silhouette': silhouette_node,
+    'fly': fly_node,
+    'scatter': scatter_node,
+    'starburst': starburst_node,
+    'transition': transition_node,
+}
+effect_graph = None
+compiled_effects = (None, None)  # (timeline, EffectTable) of the last timeline drawn
+
+def effects_for(timeline):
+    # Rules are matched against the lines once per timeline; frames only index the table
+    global effect_graph, compiled_effects
+    if effect_graph is None:
+        effect_graph = EffectGraph.load(EFFECT_GRAPH_FILE, effect_nodes)
+    if compiled_effects[0] is not timeline:
+        compiled_effects = (timeline, effect_graph.compile(timeline))
+    return compiled_effects[1]
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = offline_render.parse_args()
+    profiler.enabled = profiler.overlay_visible = args.profile or bool(args.profile_out)
+    if args.render:
+        render_offline(args.render, args.fps, args.duration, args.image_format, args.workers, args.chunk_seconds,
+                       args.profile_out, not args.no_audio, 1.0 if args.quality is None else args.quality,
+                       args.render_cache, args.render_cache_mb, args.incremental, args.resolution)
+    else:
+        if args.resolution:
+            set_resolution(args.resolution.size)
+        main(args.dirty_rects, args.dirty_threshold, args.drift_report, args.auto_timings,
+             args.timings, args.remark, args.profile_out, args.quality, args.min_quality)
\ No newline at end of file
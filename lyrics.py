@@ -1,26 +1,47 @@
 import pygame
 import random
+import functools
 import math
-from PIL import Image, ImageDraw, ImageFont
-
-# Initialize Pygame and its mixer
-pygame.init()
-pygame.mixer.init()
-
-# Set up display
-WIDTH, HEIGHT = 1920, 1080
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("The Drink Don't Need No Mix - Lyric Video")
+import sys
+import numpy as np
+import offline_render
+from text_cache import TextCache
+from glyph_layout import draw_karaoke, karaoke_size, sung_split
+from particle_system import ParticleSystem
+from layers import LayerCache, blit_scrolling
+from dirty_rects import DirtyRegion
+from lyric_timeline import LyricTimeline, estimate_word_times
+from lyric_timings import TimingFile, timings_path_for
+from audio_clock import AudioClock
+from frame_profiler import FrameProfiler
+from renderer import Renderer
+from render_cache import LayerLRU, RenderCache, cache_key, scene_fingerprint, DEFAULT_RENDER_CACHE_MB
+from render_profiles import SceneScale, draw_size
+
+# Offline renders run without a window or audio device
+if offline_render.wants_offline():
+    offline_render.use_headless_drivers()
+
+# Display, mixer and song are set up on first use, so importing this module stays cheap
+AUDIO_FILE = 'DrinkDontNeedNoMix.mp3'
+TOTAL_DURATION = 30  # Adjust this to match your actual audio duration
+# The scene is laid out at DESIGN_SIZE; pixel sizes below are design pixels, drawn through scene()
+DESIGN_SIZE = (1920, 1080)
+renderer = Renderer(DESIGN_SIZE, "The Drink Don't Need No Mix - Lyric Video", AUDIO_FILE, TOTAL_DURATION)
+WIDTH, HEIGHT = renderer.size
+scene = SceneScale(DESIGN_SIZE)
 
 # Colors
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 NEON_COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (255, 0, 255), (0, 255, 255)]
+LYRIC_COLOR = (255, 0, 0)
+SUNG_COLOR = (255, 255, 0)  # karaoke highlight of the words already sung
 
 # Fonts
-pygame.font.init()
-font = pygame.font.Font(None, 36)
-timer_font = pygame.font.Font(None, 24)
+LYRIC_FONT_SIZE = 74  # largest size; long lines shrink to fit the width
+TIMER_FONT_SIZE = 24
+profiler = FrameProfiler()
 
 # Lyrics with timestamps (in seconds)
 lyrics = [
@@ -29,166 +50,396 @@ lyrics = [
     (9, "Drive up to the dive bar, get PBR, that's just how we start our nights"),
     (13, "I see them bachelorettes on Broadway and they all wanna be my wife")
 ]
-
-# Load the audio file
-pygame.mixer.music.load('DrinkDontNeedNoMix.mp3')
-
-# Total video duration (in seconds)
-TOTAL_DURATION = 30  # Adjust this to match your actual audio duration
-
-# Skyline
-skyline = pygame.Surface((WIDTH * 2, HEIGHT // 2))
-skyline.fill(BLACK)
-for _ in range(50):
-    x = random.randint(0, WIDTH * 2)
-    y = random.randint(HEIGHT // 4, HEIGHT // 2)
-    w = random.randint(20, 100)
-    h = random.randint(50, max(51, HEIGHT // 2 - y))  # Ensure minimum height of 1
-    pygame.draw.rect(skyline, (50, 50, 50), (x, y, w, h))
+SONG_LYRICS = tuple(lyrics)  # configure() replaces lyrics; these are the ones it goes back to
+
+LYRIC_SNAP_WINDOW = 0.25  # seconds a lyric start may move to land on an onset
+word_times = None  # per line, word start times given to configure() or None to spread words over the line
+saved_timings = True  # the song's saved taps may retime lyrics; off when configure() is given timed lyrics
+timeline = None  # built by lyric_timeline() on first use
+SEEK_STEP = 5  # seconds
+SCRUB_STEP = 0.5  # seconds
+
+def lyric_timeline():
+    # Snapping to onsets needs the audio analysis, so the timeline waits until a frame is drawn
+    global timeline
+    if timeline is None:
+        timed_lyrics, words = lyrics, word_times
+        if saved_timings:
+            # Taps saved for this song (its .timings.lrc) replace the preset times once they cover
+            # every line, word tags included, so playback and renders sing the marked words
+            timings = TimingFile(timings_path_for(renderer.audio_path), renderer.audio_hash,
+                                 [text for _, text in lyrics])
+            if timings.complete():
+                timed_lyrics, words = timings.timed_lyrics(), timings.word_times
+        timed_lyrics = renderer.cues.snap_lyrics(timed_lyrics, LYRIC_SNAP_WINDOW)
+        words = estimate_word_times(timed_lyrics, renderer.duration, words)
+        timeline = LyricTimeline(timed_lyrics, renderer.duration, words)
+    return timeline
+
+# Text and static scenery (drawn once into cached layers) are built for one size; each size
+# keeps its own, so a process switching between render profiles reuses them
+profile_caches = {}
+
+def caches_for(size):
+    caches = profile_caches.get(tuple(size))
+    if caches is None:
+        caches = profile_caches[tuple(size)] = (TextCache(), LayerCache())
+    return caches
+
+text_cache, layers = caches_for((WIDTH, HEIGHT))
+# Karaoke lines by what was sung, kept across sizes (the font size is part of the key)
+text_layers = LayerLRU()
+SIDEWALK_HEIGHT = 100
+# Only this band of the pulsating background is visible between the skyline and the sidewalk
+BACKGROUND_BAND = pygame.Rect(0, HEIGHT // 2, WIDTH, HEIGHT // 2 - scene(SIDEWALK_HEIGHT))
+
+# Last values drawn, so layers that did not change report no dirty area
+last_background_color = None
+last_skyline_offset = None
+
+# Skyline (fixed seed so every render process builds the same city)
+SKYLINE_SEED = 0
+
+def build_skyline(skyline):
+    skyline_rng = random.Random(SKYLINE_SEED)
+    skyline.fill(BLACK)
+    for _ in range(50):
+        x = skyline_rng.randint(0, WIDTH * 2)
+        y = skyline_rng.randint(HEIGHT // 4, HEIGHT // 2)
+        w = skyline_rng.randint(scene(20), scene(100))
+        h = skyline_rng.randint(scene(50), max(scene(50) + 1, HEIGHT // 2 - y))  # Ensure minimum height of 1
+        pygame.draw.rect(skyline, (50, 50, 50), (x, y, w, h))
+
+def build_sidewalk(sidewalk):
+    sidewalk_height = scene(SIDEWALK_HEIGHT)
+    pygame.draw.rect(sidewalk, (100, 100, 100), (0, 0, WIDTH, sidewalk_height))
+    for i in range(0, WIDTH, scene(50)):
+        pygame.draw.line(sidewalk, (150, 150, 150), (i, 0), (i + scene(25), sidewalk_height), scene(2))
 
 # Particle system
-particles = []
-
-def create_neon_text(text, window_width, window_height):
-    pygame.font.init()
-    max_font_size = 74  # Starting font size
-    font_size = max_font_size
-    font = pygame.font.Font(None, font_size)
-    
+PARTICLE_LIMIT = 100000  # hard cap on the pool, so memory stays bounded however long the song
+particles = ParticleSystem(NEON_COLORS, limit=PARTICLE_LIMIT)
+particle_rng = np.random.default_rng()
+PARTICLE_SPAWN_CHANCE = 0.1
+MAX_PARTICLE_LIFETIME = 2  # seconds
+
+def draw_neon_text(screen, text, sung_words, current_time):
     # Adjust font size to fit within the window width
-    while font.size(text)[0] > window_width and font_size > 1:
-        font_size -= 1
-        font = pygame.font.Font(None, font_size)
-    
-    text_width, text_height = font.size(text)
-    
-    # Create a surface for the text
-    text_surface = pygame.Surface((text_width, text_height), pygame.SRCALPHA)
-    text_surface.fill((0, 0, 0, 0))  # Make the surface transparent
-
-    # Render the text
-    text_render = font.render(text, True, (255, 0, 0))  # Adjust the color as needed
-    text_surface.blit(text_render, (0, 0))
-
-    return text_surface
+    font_size = text_cache.fit_size(text, WIDTH, scene(LYRIC_FONT_SIZE))
+    layout = text_cache.layout(text, font_size)
+    text_pos = (WIDTH // 2 - layout.width // 2,
+                HEIGHT // 2 - layout.height // 2 + math.sin(current_time * 10) * scene(10))
+    # The bob only moves the line, so it is drawn once per word and sung pixel (a repeated
+    # chorus or a held word reuses the layer) and blitted where the bob puts it
+    size = karaoke_size(text_cache, layout, font_size, LYRIC_COLOR)
+    key = ('lyric', text, font_size, sung_split(layout, sung_words))
+    layer = text_layers.get(key, size, lambda surface: draw_karaoke(
+        surface, text_cache, layout, (0, 0), font_size, LYRIC_COLOR, SUNG_COLOR, sung_words))
+    screen.blit(layer, text_pos)
+    return pygame.Rect(text_pos[0], text_pos[1], layout.width, layout.height)
 
 def draw_sidewalk(screen):
-    pygame.draw.rect(screen, (100, 100, 100), (0, HEIGHT - 100, WIDTH, 100))
-    for i in range(0, WIDTH, 50):
-        pygame.draw.line(screen, (150, 150, 150), (i, HEIGHT - 100), (i + 25, HEIGHT), 2)
+    sidewalk = layers.get('sidewalk', (WIDTH, scene(SIDEWALK_HEIGHT)), build_sidewalk)
+    screen.blit(sidewalk, (0, HEIGHT - scene(SIDEWALK_HEIGHT)))
+    # Static: the sidewalk never differs from the previous frame
+    return None
 
 def draw_neon_lights(screen):
+    rects = []
     for _ in range(20):
         x = random.randint(0, WIDTH)
         y = random.randint(0, HEIGHT // 2)
         color = random.choice(NEON_COLORS)
-        pygame.draw.circle(screen, color, (x, y), random.randint(2, 5))
+        rects.append(pygame.draw.circle(screen, color, (x, y), random.randint(scene(2), scene(5))))
+    return rects
 
 def draw_timers(screen, current_time, next_lyric_time, total_duration):
     elapsed_time = f"Elapsed Time: {current_time:.2f}s"
     time_to_next = f"Time to Next Lyric: {max(0, next_lyric_time - current_time):.2f}s"
     time_remaining = f"Time Remaining: {max(0, total_duration - current_time):.2f}s"
 
+    timer_font = text_cache.font(scene(TIMER_FONT_SIZE))
     elapsed_text = timer_font.render(elapsed_time, True, WHITE)
     next_text = timer_font.render(time_to_next, True, WHITE)
     remaining_text = timer_font.render(time_remaining, True, WHITE)
 
-    screen.blit(elapsed_text, (10, 10))
-    screen.blit(next_text, (10, 40))
-    screen.blit(remaining_text, (10, 70))
+    return [screen.blit(elapsed_text, (scene(10), scene(10))),
+            screen.blit(next_text, (scene(10), scene(40))),
+            screen.blit(remaining_text, (scene(10), scene(70)))]
 
 def draw_pulsating_background(screen, current_time):
+    global last_background_color
     color = int(128 + 127 * math.sin(current_time * 2))
-    screen.fill((color // 8, color // 8, color // 4))
+    screen.fill((color // 8, color // 8, color // 4), BACKGROUND_BAND)
+    if color == last_background_color:
+        return None
+    last_background_color = color
+    return BACKGROUND_BAND
 
 def draw_scrolling_skyline(screen, current_time):
-    x = int(current_time * 50) % WIDTH
-    screen.blit(skyline, (-x, 0))
-    screen.blit(skyline, (WIDTH - x, 0))
+    global last_skyline_offset
+    skyline = layers.get('skyline', (WIDTH * 2, HEIGHT // 2), build_skyline)
+    offset = int(current_time * scene(50)) % WIDTH
+    rect = blit_scrolling(screen, skyline, offset)
+    if offset == last_skyline_offset:
+        return None
+    last_skyline_offset = offset
+    return rect
 
 def draw_bachelorettes(screen, current_time):
+    rects = []
     for i in range(5):
-        x = (i * 200 + int(current_time * 100)) % WIDTH
-        y = HEIGHT - 150
+        x = (i * scene(200) + int(current_time * scene(100))) % WIDTH
+        y = HEIGHT - scene(150)
         color = NEON_COLORS[i % len(NEON_COLORS)]
-        pygame.draw.line(screen, color, (x, y), (x, y - 50), 3)
-        pygame.draw.circle(screen, color, (x, y - 60), 10)
-        pygame.draw.line(screen, color, (x, y - 30), (x - 20, y + 20), 3)
-        pygame.draw.line(screen, color, (x, y - 30), (x + 20, y + 20), 3)
-
-def create_particle(x, y):
-    return {
-        'x': x,
-        'y': y,
-        'dx': random.uniform(-2, 2),
-        'dy': random.uniform(-2, 2),
-        'lifetime': random.uniform(0.5, 2),
-        'color': random.choice(NEON_COLORS)
-    }
+        line_width, arm, body = scene(3), scene(20), scene(30)
+        rects.append(pygame.draw.line(screen, color, (x, y), (x, y - scene(50)), line_width))
+        rects.append(pygame.draw.circle(screen, color, (x, y - scene(60)), scene(10)))
+        rects.append(pygame.draw.line(screen, color, (x, y - body), (x - arm, y + arm), line_width))
+        rects.append(pygame.draw.line(screen, color, (x, y - body), (x + arm, y + arm), line_width))
+    return rects
+
+def create_particles(count, rng):
+    particles.spawn(
+        x=rng.integers(0, WIDTH, count, endpoint=True),
+        y=rng.integers(0, HEIGHT, count, endpoint=True),
+        vx=rng.uniform(-scene(2), scene(2), count),
+        vy=rng.uniform(-scene(2), scene(2), count),
+        life=rng.uniform(0.5, MAX_PARTICLE_LIFETIME, count),
+        size=np.full(count, scene(2)),
+        color=rng.integers(0, len(NEON_COLORS), count),
+    )
 
 def update_particles(particles, dt):
-    for particle in particles[:]:
-        particle['x'] += particle['dx']
-        particle['y'] += particle['dy']
-        particle['lifetime'] -= dt
-        if particle['lifetime'] <= 0:
-            particles.remove(particle)
+    particles.step(dt)
 
 def draw_particles(screen, particles):
-    for particle in particles:
-        pygame.draw.circle(screen, particle['color'], (int(particle['x']), int(particle['y'])), 2)
-
-def main():
+    particles.draw(screen, radius=scene(2))
+    return particles.dirty_rects(radius=scene(2))
+
+def step_particles(dt, rng=None):
+    rng = particle_rng if rng is None else rng
+    if rng.random() < PARTICLE_SPAWN_CHANCE:
+        create_particles(1, rng)
+
+    update_particles(particles, dt)
+
+def draw_frame(screen, current_time, dt=1/60, particle_rng=None, dirty=None):
+    # Each draw function returns the rects it changed; they are only used for dirty-rect presenting
+    with profiler.stage('background'):
+        changed = [draw_pulsating_background(screen, current_time)]
+    with profiler.stage('skyline'):
+        changed.append(draw_scrolling_skyline(screen, current_time))
+        changed.append(draw_sidewalk(screen))
+    with profiler.stage('lights'):
+        changed += draw_neon_lights(screen)
+        changed += draw_bachelorettes(screen, current_time)
+
+    with profiler.stage('particles'):
+        step_particles(dt, particle_rng)
+        changed += draw_particles(screen, particles)
+
+    # The active line is looked up from the time alone, so seeking just works
+    lyric = lyric_timeline().state_at(current_time)
+    if lyric.text is not None:
+        with profiler.stage('text'):
+            sung_words = lyric_timeline().sung_words(lyric.index, current_time)
+            changed.append(draw_neon_text(screen, lyric.text, sung_words, current_time))
+
+    with profiler.stage('timers'):
+        changed += draw_timers(screen, current_time, lyric.next_time, renderer.duration)
+    if dirty is not None:
+        dirty.add(changed)
+
+def main(dirty_rects=False, dirty_threshold=0.75, drift_histogram=False, profile_out=None):
+    screen = renderer.screen
     clock = pygame.time.Clock()
+    dirty = DirtyRegion((WIDTH, HEIGHT), dirty_threshold) if dirty_rects else None
     pygame.mixer.music.play()
-    start_time = pygame.time.get_ticks()
-    current_lyric_index = 0
+    # Visuals follow the audio position rather than a separately started timer
+    playback = AudioClock()
 
     running = True
     while running:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-
-        current_time = (pygame.time.get_ticks() - start_time) / 1000
-
-        draw_pulsating_background(screen, current_time)
-        draw_scrolling_skyline(screen, current_time)
-        draw_sidewalk(screen)
-        draw_neon_lights(screen)
-        draw_bachelorettes(screen, current_time)
-
-        if random.random() < 0.1:
-            particles.append(create_particle(random.randint(0, WIDTH), random.randint(0, HEIGHT)))
-
-        update_particles(particles, 1/60)
-        draw_particles(screen, particles)
-
-        if current_lyric_index < len(lyrics):
-            lyric_time, lyric_text = lyrics[current_lyric_index]
-            if current_time >= lyric_time:
-                neon_text = create_neon_text(lyric_text, WIDTH, HEIGHT)
-                text_pos = (WIDTH // 2 - neon_text.get_width() // 2, 
-                            HEIGHT // 2 - neon_text.get_height() // 2 + math.sin(current_time * 10) * 10)
-                screen.blit(neon_text, text_pos)
-               
-                if current_lyric_index + 1 < len(lyrics) and current_time >= lyrics[current_lyric_index + 1][0]:
-                    current_lyric_index += 1
-
-        next_lyric_time = TOTAL_DURATION
-        if current_lyric_index < len(lyrics) - 1:
-            next_lyric_time = lyrics[current_lyric_index + 1][0]
-
-        draw_timers(screen, current_time, next_lyric_time, TOTAL_DURATION)
-
-        pygame.display.flip()
+            elif event.type == pygame.KEYDOWN:
+                # LEFT/RIGHT seek, COMMA/PERIOD scrub in small steps, HOME restarts
+                if event.key == pygame.K_LEFT:
+                    playback.scrub(-SEEK_STEP, renderer.duration)
+                elif event.key == pygame.K_RIGHT:
+                    playback.scrub(SEEK_STEP, renderer.duration)
+                elif event.key == pygame.K_COMMA:
+                    playback.scrub(-SCRUB_STEP, renderer.duration)
+                elif event.key == pygame.K_PERIOD:
+                    playback.scrub(SCRUB_STEP, renderer.duration)
+                elif event.key == pygame.K_HOME:
+                    playback.seek(0)
+                elif event.key == pygame.K_F3:
+                    profiler.toggle_overlay()
+
+        current_time = playback.time()
+
+        draw_frame(screen, current_time, dirty=dirty)
+        renderer.frame_drawn()
+        overlay = profiler.draw_overlay(screen, text_cache.font(scene(TIMER_FONT_SIZE)))
+        if dirty is not None:
+            dirty.add(overlay)
+
+        with profiler.stage('present'):
+            if dirty is not None:
+                dirty.present()
+            else:
+                pygame.display.flip()
         clock.tick(60)
+        profiler.end_frame()
 
-        if current_time >= TOTAL_DURATION or not pygame.mixer.music.get_busy():
+        if current_time >= renderer.duration or not pygame.mixer.music.get_busy():
             running = False
 
+    if dirty is not None:
+        print(dirty.describe())
+    print(playback.drift.describe(histogram=drift_histogram))
+    print(renderer.describe_startup())
+    report_profile(profile_out)
     pygame.mixer.music.stop()
     pygame.quit()
 
+def set_resolution(size):
+    # Rebind the size-dependent globals so every draw function renders at size, with the
+    # scene scaled from its design size and the text and layer caches of that size
+    global WIDTH, HEIGHT, BACKGROUND_BAND, last_background_color, last_skyline_offset, text_cache, layers
+    WIDTH, HEIGHT = size
+    renderer.set_resolution(size)
+    scene.resize(size)
+    text_cache, layers = caches_for(size)
+    BACKGROUND_BAND = pygame.Rect(0, HEIGHT // 2, WIDTH, HEIGHT // 2 - scene(SIDEWALK_HEIGHT))
+    last_background_color = last_skyline_offset = None
+    particles.clear()
+
+def configure(audio_path=AUDIO_FILE, timed_lyrics=None, size=(WIDTH, HEIGHT), timed_words=None):
+    # Switch song, lyrics and size so one process can render several songs (batch renders);
+    # the defaults are this script's own song. Without timed_lyrics the script's lyrics are
+    # used, retimed by the song's saved taps as in a standalone run
+    global lyrics, word_times, saved_timings, timeline
+    if audio_path != renderer.audio_path:
+        # Another song runs for its own length rather than this one's fixed duration
+        renderer.load_song(audio_path, TOTAL_DURATION if audio_path == AUDIO_FILE else None)
+    lyrics = list(SONG_LYRICS if timed_lyrics is None else timed_lyrics)
+    word_times = timed_words
+    saved_timings = timed_lyrics is None
+    timeline = None
+    if size != (WIDTH, HEIGHT):
+        set_resolution(size)
+
+# Finished frames reused between renders (--render-cache), one cache per process
+render_cache = None
+scene_fingerprints = {}
+
+def frame_cache(directory, budget_mb=DEFAULT_RENDER_CACHE_MB):
+    global render_cache
+    if directory is None:
+        return None
+    if render_cache is None or render_cache.directory != directory:
+        render_cache = RenderCache(directory, budget_mb)
+    return render_cache
+
+def song_fingerprint():
+    fingerprint = scene_fingerprints.get(renderer.audio_path)
+    if fingerprint is None:
+        fingerprint = scene_fingerprint(sys.modules[__name__], [renderer.audio_path])
+        scene_fingerprints[renderer.audio_path] = fingerprint
+    return fingerprint
+
+def frame_key(frame_index, fps, current_time):
+    # A frame is fixed by the code, the song and size, its index (which seeds the lights and
+    # particles) and the lyric state; editing one line only changes the frames that show it
+    fingerprint = song_fingerprint()
+    lyric = lyric_timeline().state_at(current_time)
+    sung_words = lyric_timeline().sung_words(lyric.index, current_time) if lyric.text is not None else None
+    return cache_key(fingerprint, WIDTH, HEIGHT, fps, frame_index, renderer.duration, tuple(lyric), sung_words)
+
+def frame_keys(start_frame, end_frame, fps):
+    for frame_index in range(start_frame, end_frame):
+        yield frame_key(frame_index, fps, frame_index / fps)
+
+def render_range(start_frame, end_frame, fps, cache_dir=None, cache_mb=DEFAULT_RENDER_CACHE_MB, size=None):
+    # Worker processes start at the design size and switch to the size the render draws at
+    if size is not None and tuple(size) != (WIDTH, HEIGHT):
+        set_resolution(size)
+    # Rebuild the particles that would still be alive at start_frame so any chunk
+    # of the timeline renders exactly as it would in one sequential pass
+    particles.clear()
+    warmup_frames = int(math.ceil(MAX_PARTICLE_LIFETIME * fps))
+    for frame_index in range(max(0, start_frame - warmup_frames), start_frame):
+        step_particles(1 / fps, offline_render.frame_rng(frame_index, 'particles'))
+
+    screen = renderer.screen
+    cache = frame_cache(cache_dir, cache_mb)
+    if cache is not None:
+        # Text layers pushed out of memory go to the cache directory rather than being redrawn
+        text_layers.spill_to(cache, song_fingerprint())
+    for frame_index in range(start_frame, end_frame):
+        offline_render.seed_frame(frame_index)
+        rng = offline_render.frame_rng(frame_index, 'particles')
+        cached = key = None
+        if cache is not None:
+            key = frame_key(frame_index, fps, frame_index / fps)
+            cached = cache.get(key, (WIDTH, HEIGHT))
+        if cached is not None:
+            # Particles carry over to later frames, so they advance even when the frame is reused
+            step_particles(1 / fps, rng)
+            screen.blit(cached, (0, 0))
+        else:
+            draw_frame(screen, frame_index / fps, 1 / fps, rng)
+            if cache is not None:
+                cache.put(key, screen)
+        renderer.frame_drawn()
+        profiler.end_frame()
+        yield frame_index, screen
+
+def report_profile(profile_out=None):
+    if profiler.enabled:
+        print(profiler.describe())
+        if profile_out:
+            profiler.dump(profile_out)
+
+def render_offline(output, fps=60, duration=None, image_format='png', workers=1, chunk_seconds=2.0,
+                   profile_out=None, audio=True, cache_dir=None, cache_mb=DEFAULT_RENDER_CACHE_MB, incremental=False,
+                   render_profile=None):
+    # Frame i is drawn at exactly i / fps, so the output does not depend on how long each frame takes
+    total_duration = renderer.duration if duration is None else min(duration, renderer.duration)
+    # Analyse once here so worker processes find the cue file instead of all writing it
+    renderer.load_cues()
+    # A render profile draws at its own size and writes frames resampled to its output size
+    output_size = (WIDTH, HEIGHT) if render_profile is None else render_profile.size
+    if render_profile is not None:
+        set_resolution(draw_size(render_profile))
+    frames = functools.partial(render_range, cache_dir=cache_dir, cache_mb=cache_mb, size=(WIDTH, HEIGHT))
+    stats = offline_render.render_offline(frames, output_size, total_duration, fps, output,
+                                          image_format, workers, chunk_seconds,
+                                          renderer.audio_path if audio else None,
+                                          frame_keys if incremental else None)
+    if workers == 1:
+        # Worker processes keep their own caches and profiles
+        print(text_cache.describe())
+        print(text_layers.describe())
+        if render_cache is not None:
+            print(render_cache.describe())
+        print(renderer.describe_startup())
+        report_profile(profile_out)
+    pygame.quit()
+    return stats
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = offline_render.parse_args()
+    profiler.enabled = profiler.overlay_visible = args.profile or bool(args.profile_out)
+    if args.render:
+        render_offline(args.render, args.fps, args.duration, args.image_format, args.workers, args.chunk_seconds,
+                       args.profile_out, not args.no_audio, args.render_cache, args.render_cache_mb,
+                       args.incremental, args.resolution)
+    else:
+        if args.resolution:
+            set_resolution(args.resolution.size)
+        main(args.dirty_rects, args.dirty_threshold, args.drift_report, args.profile_out)
@@ -0,0 +1,554 @@
+import argparse
+import functools
+import hashlib
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import queue
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+import pygame
+
+from assets import resident_memory_mb
+from render_cache import DEFAULT_RENDER_CACHE_MB
+from render_profiles import RENDER_PROFILES, resolve_profile
+
+RENDER_FLAG = '--render'
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm', '.avi')
+RENDER_SEED = 0
+ENCODER_QUEUE_FRAMES = 4  # frames buffered between rendering and the ffmpeg writer thread
+RSS_SAMPLE_FRAMES = 60  # frames between resident memory samples in a sequential render
+
+
+def wants_offline(argv=None):
+    argv = sys.argv if argv is None else argv
+    return RENDER_FLAG in argv
+
+
+def use_headless_drivers():
+    # Must run before pygame.init() so no window or audio device is opened
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    # Leave SIGTERM/SIGINT alone so render workers can be stopped by the pool
+    os.environ.setdefault('SDL_NO_SIGNAL_HANDLERS', '1')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(RENDER_FLAG, metavar='OUTPUT', default=None,
+                        help="Render offline to a video file (.mp4, .mkv, ...) or an image sequence directory")
+    parser.add_argument('--fps', type=int, default=60)
+    parser.add_argument('--duration', type=float, default=None,
+                        help="Only render the first N seconds")
+    parser.add_argument('--image-format', default='png', choices=['png', 'bmp', 'tga', 'jpg'])
+    parser.add_argument('--no-audio', action='store_true',
+                        help="Leave the song out of video renders")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Render chunks of the timeline in this many processes")
+    parser.add_argument('--chunk-seconds', type=float, default=2.0)
+    parser.add_argument('--resolution', metavar='PROFILE', type=resolve_profile, default=None,
+                        help=f"Render profile ({', '.join(RENDER_PROFILES)}) or WIDTHxHEIGHT; "
+                             "default is the script's own size")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Keep --chunk-seconds segments and a manifest of their inputs next to the output, "
+                             "and only re-render the segments whose inputs changed")
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help="Playback: only push changed screen areas to the display")
+    parser.add_argument('--dirty-threshold', type=float, default=0.75,
+                        help="Fraction of the screen above which a full flip is used instead")
+    parser.add_argument('--auto-timings', action='store_true',
+                        help="Playback: place lyrics from the audio analysis instead of tapping SPACE")
+    parser.add_argument('--timings', metavar='PATH',
+                        help="Playback: lyric timing file to load and save (.lrc or .json, default next to the audio)")
+    parser.add_argument('--remark', action='store_true',
+                        help="Playback: ignore saved lyric timings and tap every line again")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time each draw stage; playback shows an overlay (toggle with F3)")
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help="Write the per-stage timings at exit: .csv, or .json for a Chrome trace (implies --profile)")
+    parser.add_argument('--drift-report', action='store_true',
+                        help="Playback: print a histogram of audio-vs-visual offsets at exit")
+    parser.add_argument('--render-cache', metavar='DIR', default=None,
+                        help="Keep finished frames in DIR and reuse them when a later render draws the same frame")
+    parser.add_argument('--render-cache-mb', type=float, default=DEFAULT_RENDER_CACHE_MB,
+                        help="Disk space DIR may take; least recently used frames are dropped beyond it")
+    parser.add_argument('--quality', type=float, default=None,
+                        help="Pin effect quality from 0 (cheapest) to 1 (full) instead of adapting it to the "
+                             "frame time; renders always use a fixed quality, 1 unless given")
+    parser.add_argument('--min-quality', type=float, default=0.0,
+                        help="Playback: lowest quality the governor may drop to under load")
+    return parser.parse_args(argv)
+
+
+def load_script(path, name):
+    # Import a lyric script as a module (not __main__) so nothing starts playing
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def frame_count(total_duration, fps):
+    # Deterministic clock: frame i is always shown at i / fps, independent of wall time
+    return int(math.ceil(total_duration * fps))
+
+
+def seed_frame(frame_index, seed=RENDER_SEED):
+    # Reseed the shared random module so a frame looks the same whichever process draws it
+    random.seed(f"{seed}:frame:{frame_index}")
+
+
+def frame_rng(frame_index, stream, seed=RENDER_SEED):
+    # Independent per-frame NumPy stream for state that carries across frames (particles)
+    return np.random.default_rng([seed, zlib.crc32(stream.encode()), frame_index])
+
+
+def is_video(output):
+    return output.lower().endswith(VIDEO_EXTENSIONS)
+
+
+class ImageSequenceWriter:
+    def __init__(self, directory, image_format='png'):
+        self.directory = directory
+        self.image_format = image_format
+        self.frames = 0
+        self.write_seconds = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame_index, surface):
+        start = time.perf_counter()
+        path = os.path.join(self.directory, f"frame_{frame_index:06d}.{self.image_format}")
+        pygame.image.save(surface, path)
+        self.write_seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def close(self):
+        pass
+
+    def describe(self):
+        fps = self.frames / self.write_seconds if self.write_seconds > 0 else float('inf')
+        return f"Image writes: {self.frames} frames at {fps:.1f} fps"
+
+
+RAW_PIXEL_FORMATS = {'rgba', 'bgra', 'argb', 'abgr', 'rgb0', 'bgr0', '0rgb', '0bgr'}
+
+
+def raw_pixel_format(surface):
+    # ffmpeg pix_fmt naming the surface's own byte order, so frames can be piped without
+    # conversion; None when the layout has no direct ffmpeg equivalent
+    if surface.get_bytesize() != 4 or surface.get_pitch() != surface.get_width() * 4:
+        return None
+    red, green, blue, alpha = surface.get_masks()
+    channels = {red: 'r', green: 'g', blue: 'b'}
+    if alpha:
+        channels[alpha] = 'a'
+    byte_masks = [0xff << (8 * i) for i in range(4)]
+    if sys.byteorder == 'big':
+        byte_masks.reverse()
+    pixel_format = ''.join(channels.get(mask, '0') for mask in byte_masks)
+    return pixel_format if pixel_format in RAW_PIXEL_FORMATS else None
+
+
+class FFmpegWriter:
+    """Pipes raw frames into an ffmpeg subprocess from a writer thread, optionally muxing audio.
+
+    write() copies the surface's pixel buffer into a free buffer from a fixed pool and queues
+    it; the thread hands each buffer straight to the pipe and returns it to the pool. With
+    the pool empty write() blocks, so a slow encoder holds rendering back instead of frames
+    piling up in memory. Frames keep the surface's 4-byte layout (ffmpeg converts), falling
+    back to RGB bytes for formats ffmpeg has no name for.
+    """
+
+    def __init__(self, path, size, fps, audio=None, queue_frames=ENCODER_QUEUE_FRAMES):
+        self.path = path
+        self.size = size
+        self.fps = fps
+        self.audio = audio
+        self.queue_frames = queue_frames
+        self.process = None
+        self.thread = None
+        self.error = None
+        self.frames = 0
+        self.encode_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def command(self, pixel_format):
+        width, height = self.size
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', pixel_format, '-s', f"{width}x{height}", '-r', str(self.fps),
+            '-i', '-',
+        ]
+        if self.audio:
+            # Frame 0 is time 0 of the track; -shortest trims the audio to the rendered span
+            command += ['-i', self.audio, '-map', '0:v', '-map', '1:a', '-c:a', 'aac', '-b:a', '192k', '-shortest']
+        return command + ['-c:v', 'libx264', '-pix_fmt', 'yuv420p', self.path]
+
+    def start(self, surface):
+        self.pixel_format = raw_pixel_format(surface)
+        frame_bytes = self.size[0] * self.size[1] * (4 if self.pixel_format else 3)
+        try:
+            self.process = subprocess.Popen(self.command(self.pixel_format or 'rgb24'), stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            raise RuntimeError("ffmpeg was not found on PATH; render to an image sequence directory instead")
+
+        # Two buffers more than the queue holds: one being written to the pipe, one being filled
+        self.free = queue.Queue()
+        for _ in range(self.queue_frames + 2):
+            self.free.put(np.empty(frame_bytes, dtype=np.uint8))
+        self.pending = queue.Queue(maxsize=self.queue_frames)
+        self.thread = threading.Thread(target=self._encode, name='ffmpeg-writer', daemon=True)
+        self.thread.start()
+
+    def _encode(self):
+        stdin = self.process.stdin
+        while True:
+            buffer = self.pending.get()
+            if buffer is None:
+                break
+            if self.error is None:
+                start = time.perf_counter()
+                try:
+                    stdin.write(buffer)
+                except (BrokenPipeError, OSError) as e:
+                    # Keep draining so the render side never waits on a dead encoder
+                    self.error = e
+                self.encode_seconds += time.perf_counter() - start
+            self.free.put(buffer)
+
+    def write(self, frame_index, surface):
+        if self.process is None:
+            self.start(surface)
+        if self.error is not None:
+            raise RuntimeError(f"ffmpeg stopped accepting frames: {self.error}")
+
+        start = time.perf_counter()
+        buffer = self.free.get()
+        self.blocked_seconds += time.perf_counter() - start
+        if self.pixel_format:
+            np.copyto(buffer, np.frombuffer(surface.get_view('0'), dtype=np.uint8))
+        else:
+            buffer[:] = np.frombuffer(pygame.image.tobytes(surface, 'RGB'), dtype=np.uint8)
+
+        depth = self.pending.qsize()
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+        start = time.perf_counter()
+        self.pending.put(buffer)
+        self.blocked_seconds += time.perf_counter() - start
+        self.frames += 1
+
+    def close(self):
+        if self.process is None:
+            return
+        self.pending.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self.process.returncode}")
+        if self.error is not None:
+            raise RuntimeError(f"ffmpeg stopped accepting frames: {self.error}")
+
+    def describe(self):
+        encode_fps = self.frames / self.encode_seconds if self.encode_seconds > 0 else float('inf')
+        average_depth = self.depth_total / self.frames if self.frames else 0.0
+        return (f"Encoder: {self.frames} frames at {encode_fps:.1f} fps ({self.pixel_format or 'rgb24'} pipe), "
+                f"queue depth {average_depth:.1f} avg / {self.depth_max} max of {self.queue_frames}, "
+                f"render blocked {self.blocked_seconds:.2f}s on a full queue")
+
+
+class MemorySampler:
+    """Resident memory sampled every few frames, showing whether a render's memory stays flat.
+
+    Caches fill up early in a render, so what matters is the growth over its second half. The
+    sampler keeps the peak, the latest sample and the samples at doubling frame counts (60,
+    120, 240, ...), so its own memory barely grows with the render's length, and reports how
+    much RSS grew from about halfway through to the end.
+    """
+
+    def __init__(self, every=RSS_SAMPLE_FRAMES):
+        self.every = every
+        self.frames = 0
+        self.first = self.peak = self.last = None
+        self.milestones = {}  # frame -> RSS at 0 and at every power-of-two multiple of `every`
+
+    def sample(self):
+        # Call once per frame; reads /proc only every `every` frames
+        if self.frames % self.every == 0:
+            rss = self.record(resident_memory_mb())
+            steps = self.frames // self.every
+            if steps & (steps - 1) == 0:
+                self.milestones[self.frames] = rss
+        self.frames += 1
+
+    def record(self, rss):
+        if self.first is None:
+            self.first = rss
+        self.peak = rss if self.peak is None else max(self.peak, rss)
+        self.last = rss
+        return rss
+
+    def describe(self):
+        if self.first is None:
+            return "Memory: no frames sampled"
+        self.record(resident_memory_mb())
+        text = (f"Memory: RSS {self.first:.0f} MB at the first frame, {self.peak:.0f} MB peak, "
+                f"{self.last:.0f} MB at the end")
+        halfway = max((frame for frame in self.milestones if frame <= self.frames // 2), default=None)
+        if halfway:
+            text += (f", {self.last - self.milestones[halfway]:+.1f} MB over the last "
+                     f"{self.frames - halfway} of {self.frames} frames")
+        return text
+
+
+def open_writer(output, size, fps, image_format='png', audio=None):
+    if is_video(output):
+        return FFmpegWriter(output, size, fps, audio)
+    return ImageSequenceWriter(output, image_format)
+
+
+def write_frames(render_range, start_frame, end_frame, size, fps, output, image_format='png', audio=None,
+                 report=False):
+    writer = open_writer(output, size, fps, image_format, audio)
+    memory = MemorySampler()
+    frames = 0
+    render_seconds = 0.0
+    try:
+        # Time spent inside the generator is rendering; time in write() is handed to the writer
+        frame_start = time.perf_counter()
+        for frame_index, surface in render_range(start_frame, end_frame, fps):
+            render_seconds += time.perf_counter() - frame_start
+            writer.write(frame_index, surface)
+            frames += 1
+            if report:
+                memory.sample()
+            frame_start = time.perf_counter()
+    finally:
+        writer.close()
+    if report and frames:
+        render_fps = frames / render_seconds if render_seconds > 0 else float('inf')
+        print(f"Render: {frames} frames at {render_fps:.1f} fps. {writer.describe()}")
+        print(memory.describe())
+    return frames
+
+
+def resample_frames(render_range, size, start_frame, end_frame, fps):
+    # Frames drawn at another size than the output go into one reused surface: supersampled
+    # frames are smoothed down, preview frames are scaled up (a filter would cost more than
+    # drawing at full size saves); frames already at size pass through
+    size = tuple(size)
+    output = None
+    for frame_index, surface in render_range(start_frame, end_frame, fps):
+        if surface.get_size() != size:
+            if output is None:
+                output = pygame.Surface(size, 0, surface)
+            if surface.get_width() > size[0] and surface.get_bytesize() >= 3:
+                pygame.transform.smoothscale(surface, size, output)
+            else:
+                pygame.transform.scale(surface, size, output)
+            surface = output
+        yield frame_index, surface
+
+
+def _render_chunk(task):
+    return write_frames(*task)
+
+
+def concat_segments(segments, output, audio=None):
+    list_path = os.path.join(os.path.dirname(segments[0]), 'segments.txt')
+    with open(list_path, 'w') as f:
+        for segment in segments:
+            f.write(f"file '{os.path.abspath(segment)}'\n")
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio:
+        # Segments are video only; the track is muxed once over the stitched timeline
+        command += ['-i', audio, '-map', '0:v', '-map', '1:a', '-c:a', 'aac', '-b:a', '192k', '-shortest']
+    command += ['-c:v', 'copy', output]
+    if subprocess.run(command).returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to concatenate segments into {output}")
+
+
+def run_chunks(tasks, workers):
+    # Yields the frame count of each write_frames task, in order
+    if workers <= 1:
+        for task in tasks:
+            yield _render_chunk(task)
+        return
+    # spawn: every worker imports the script fresh and builds its own pygame state and assets
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers) as pool:
+        yield from pool.imap(_render_chunk, tasks)
+        pool.close()
+        pool.join()
+
+
+def render_parallel(render_range, size, total_frames, fps, output, image_format, workers, chunk_frames,
+                    audio=None):
+    chunks = [(start, min(start + chunk_frames, total_frames)) for start in range(0, total_frames, chunk_frames)]
+    segment_dir = None
+    if is_video(output):
+        # Each chunk becomes its own segment, stitched back together in timeline order
+        segment_dir = tempfile.mkdtemp(prefix='segments_', dir=os.path.dirname(os.path.abspath(output)))
+        extension = os.path.splitext(output)[1]
+        targets = [os.path.join(segment_dir, f"segment_{i:05d}{extension}") for i in range(len(chunks))]
+    else:
+        # Image sequences are written straight into place, frame numbers keep them ordered
+        targets = [output] * len(chunks)
+
+    tasks = [(render_range, start, end, size, fps, target, image_format)
+             for (start, end), target in zip(chunks, targets)]
+    try:
+        frames = sum(run_chunks(tasks, workers))
+        if segment_dir:
+            concat_segments(targets, output, audio)
+    finally:
+        if segment_dir:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+    return frames
+
+
+class SegmentManifest:
+    """Digest of every input of each rendered segment, kept next to an incremental render.
+
+    A segment's digest covers the keys of all its frames, so it changes exactly when one of
+    its frames would come out different. Settings that change every frame (size, fps,
+    format, segment length) invalidate the whole manifest.
+    """
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.settings = settings
+        self.segments = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('settings') == settings:
+                self.segments = data['segments']
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'settings': self.settings, 'segments': self.segments}, f, indent=1, sort_keys=True)
+        # Replace in one step so an interrupted render never leaves a half-written manifest
+        os.replace(temporary, self.path)
+
+    def mark(self, segment, digest):
+        self.segments[str(segment)] = digest
+        self.save()
+
+
+def segment_digest(frame_keys, start_frame, end_frame, fps, seed=RENDER_SEED):
+    digest = hashlib.sha1(f"{seed}:{start_frame}:{end_frame}".encode('ascii'))
+    for key in frame_keys(start_frame, end_frame, fps):
+        digest.update(key.encode('ascii'))
+    return digest.hexdigest()
+
+
+def render_incremental(render_range, frame_keys, size, total_frames, fps, output, image_format, workers,
+                       segment_frames, audio=None):
+    """Re-render only the segments whose frame keys changed since the last render to output.
+
+    frame_keys(start_frame, end_frame, fps) must yield a string per frame that changes whenever
+    the frame's pixels would. Video segments stay in <output>.segments and are stitched with a
+    stream copy, so an edit costs the changed segments plus one concat; image sequences are
+    rewritten in place.
+    """
+    segments = [(start, min(start + segment_frames, total_frames))
+                for start in range(0, total_frames, segment_frames)]
+    video = is_video(output)
+    if video:
+        segment_dir = output + '.segments'
+        extension = os.path.splitext(output)[1]
+        targets = [os.path.join(segment_dir, f"segment_{i:05d}{extension}") for i in range(len(segments))]
+    else:
+        segment_dir = output
+        extension = '.' + image_format
+        targets = [output] * len(segments)
+    os.makedirs(segment_dir, exist_ok=True)
+    settings = {'size': list(size), 'fps': fps, 'format': extension, 'segment_frames': segment_frames}
+    manifest = SegmentManifest(os.path.join(segment_dir, 'manifest.json'), settings)
+
+    def rendered(index):
+        if video:
+            return os.path.exists(targets[index])
+        start, end = segments[index]
+        return all(os.path.exists(os.path.join(output, f"frame_{i:06d}{extension}")) for i in range(start, end))
+
+    digests = [segment_digest(frame_keys, start, end, fps) for start, end in segments]
+    dirty = [i for i, digest in enumerate(digests) if manifest.segments.get(str(i)) != digest or not rendered(i)]
+    tasks = [(render_range, *segments[i], size, fps, targets[i], image_format) for i in dirty]
+    frames = 0
+    for index, count in zip(dirty, run_chunks(tasks, workers)):
+        frames += count
+        manifest.mark(index, digests[index])
+
+    # A shorter timeline leaves segments or frames past the end that must not be stitched in
+    manifest.segments = {key: value for key, value in manifest.segments.items() if int(key) < len(segments)}
+    manifest.save()
+    for name in os.listdir(segment_dir):
+        if video and name.startswith('segment_') and name.endswith(extension):
+            stale = int(name[len('segment_'):-len(extension)]) >= len(segments)
+        elif not video and name.startswith('frame_') and name.endswith(extension):
+            stale = int(name[len('frame_'):-len(extension)]) >= total_frames
+        else:
+            continue
+        if stale:
+            os.remove(os.path.join(segment_dir, name))
+
+    if video and segments:
+        concat_segments(targets, output, audio)
+    print(f"Incremental render: {len(dirty)}/{len(segments)} segments re-rendered")
+    return frames
+
+
+def render_offline(render_range, size, total_duration, fps, output, image_format='png',
+                   workers=1, chunk_seconds=2.0, audio=None, frame_keys=None):
+    """Render every frame as fast as possible and write it out.
+
+    render_range(start_frame, end_frame, fps) must yield (frame_index, surface) for each frame
+    in the range and produce the same pixels no matter where the range starts. Surfaces of
+    another size are resampled to size. audio, if given, is muxed into video outputs starting
+    at frame 0. With frame_keys (see render_incremental) only the chunks whose inputs changed
+    since the last render are drawn.
+    """
+    total_frames = frame_count(total_duration, fps)
+    render_range = functools.partial(resample_frames, render_range, size)
+    start = time.perf_counter()
+    if frame_keys is not None:
+        chunk_frames = max(1, int(chunk_seconds * fps))
+        frames = render_incremental(render_range, frame_keys, size, total_frames, fps, output, image_format,
+                                    workers, chunk_frames, audio)
+    elif workers > 1:
+        chunk_frames = max(1, int(chunk_seconds * fps))
+        frames = render_parallel(render_range, size, total_frames, fps, output, image_format,
+                                 workers, chunk_frames, audio)
+    else:
+        frames = write_frames(render_range, 0, total_frames, size, fps, output, image_format, audio,
+                              report=True)
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'frames': frames,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else float('inf'),
+        'realtime_factor': total_duration / elapsed if elapsed > 0 else float('inf'),
+        'workers': workers,
+    }
+    print(f"Rendered {frames} frames in {elapsed:.2f}s with {workers} worker(s) "
+          f"({stats['fps']:.1f} fps, {stats['realtime_factor']:.2f}x real time) -> {output}")
+    return stats
@@ -0,0 +1,140 @@
+import numpy as np
+import pygame
+
+FIELDS = ('x', 'y', 'vx', 'vy', 'size', 'life')
+
+
+class ParticleSystem:
+    """Structure-of-arrays particle pool.
+
+    Every attribute lives in its own NumPy array and the live particles are packed at the
+    front, so spawning, integration, culling and drawing are all whole-array operations.
+    With a limit the pool never grows past it: spawns that do not fit are dropped.
+    """
+
+    def __init__(self, palette, capacity=1024, limit=None):
+        self.palette = np.array(palette, dtype=np.uint8)
+        self.limit = limit
+        self.count = 0
+        self.capacity = 0
+        self.kernels = {}
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        for name in FIELDS:
+            array = np.zeros(capacity, dtype=np.float64)
+            if self.capacity:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        color = np.zeros(capacity, dtype=np.intp)
+        if self.capacity:
+            color[:self.count] = self.color[:self.count]
+        self.color = color
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn(self, x, y, vx, vy, life, size, color):
+        spawned = len(x)
+        if self.limit is not None and self.count + spawned > self.limit:
+            spawned = max(0, self.limit - self.count)
+            x, y, vx, vy, life, size, color = (value[:spawned] if np.ndim(value) else value
+                                               for value in (x, y, vx, vy, life, size, color))
+        if spawned == 0:
+            return
+        needed = self.count + spawned
+        if needed > self.capacity:
+            capacity = max(needed, self.capacity * 2)
+            self._grow(capacity if self.limit is None else min(capacity, self.limit))
+        end = self.count + spawned
+        self.x[self.count:end] = x
+        self.y[self.count:end] = y
+        self.vx[self.count:end] = vx
+        self.vy[self.count:end] = vy
+        self.life[self.count:end] = life
+        self.size[self.count:end] = size
+        self.color[self.count:end] = color
+        self.count = end
+
+    def step(self, life_decay, size_decay=0.0):
+        n = self.count
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.life[:n] -= life_decay
+        if size_decay:
+            self.size[:n] -= size_decay
+
+        # Compact the survivors to the front in one pass instead of removing one by one
+        alive = self.life[:n] > 0
+        survivors = int(np.count_nonzero(alive))
+        if survivors != n:
+            for name in FIELDS + ('color',):
+                array = getattr(self, name)
+                array[:survivors] = array[:n][alive]
+            self.count = survivors
+
+    def dirty_rects(self, radius, max_rects=64):
+        """Screen areas the particles cover: one rect each, or their bounding box when there are many."""
+        n = self.count
+        if n == 0:
+            return []
+        x = self.x[:n].astype(np.intp)
+        y = self.y[:n].astype(np.intp)
+        if n > max_rects:
+            left, top = int(x.min()) - radius, int(y.min()) - radius
+            return [pygame.Rect(left, top, int(x.max()) + radius + 1 - left, int(y.max()) + radius + 1 - top)]
+        size = radius * 2 + 1
+        return [pygame.Rect(int(px) - radius, int(py) - radius, size, size) for px, py in zip(x, y)]
+
+    def _kernel(self, radius):
+        # Pixel offsets of a filled pygame circle, so stamped particles match pygame.draw.circle
+        kernel = self.kernels.get(radius)
+        if kernel is None:
+            stamp = pygame.Surface((radius * 2 + 1, radius * 2 + 1))
+            pygame.draw.circle(stamp, (255, 255, 255), (radius, radius), radius)
+            xs, ys = np.nonzero(pygame.surfarray.array2d(stamp))
+            kernel = self.kernels[radius] = (xs - radius, ys - radius)
+        return kernel
+
+    def draw(self, surface, radius=None):
+        """Stamp every live particle into the surface's pixels; radius defaults to each particle's size."""
+        n = self.count
+        if n == 0:
+            return
+        x = self.x[:n].astype(np.intp)
+        y = self.y[:n].astype(np.intp)
+        radii = np.full(n, radius, dtype=np.intp) if radius is not None else self.size[:n].astype(np.intp)
+        mapped = np.array([surface.map_rgb(tuple(color)) for color in self.palette], dtype=np.uint32)
+        colors = mapped[self.color[:n]]
+        width, height = surface.get_size()
+
+        # The pixel view keeps the surface locked until it goes out of scope at return
+        pixels = pygame.surfarray.pixels2d(surface)
+        # (width, height) view over row-major memory: transpose to get one flat row-major buffer
+        rows = pixels.T
+        flat = rows.reshape(-1) if rows.flags.c_contiguous else None
+        for r in np.unique(radii):
+            if r < 1:
+                continue
+            chosen = radii == r
+            dx, dy = self._kernel(int(r))
+            cx, cy, color = x[chosen], y[chosen], colors[chosen]
+
+            # Particles well inside the frame need no per-pixel clipping
+            inside = (cx >= r) & (cx < width - r) & (cy >= r) & (cy < height - r)
+            if flat is not None:
+                base = cy[inside] * width + cx[inside]
+                flat[(base[:, None] + (dy * width + dx)).ravel()] = np.repeat(color[inside], len(dx))
+                edge = ~inside
+            else:
+                edge = np.ones(len(cx), dtype=bool)
+
+            px = (cx[edge, None] + dx).ravel()
+            py = (cy[edge, None] + dy).ravel()
+            edge_color = np.repeat(color[edge], len(dx))
+            visible = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+            pixels[px[visible], py[visible]] = edge_color[visible]
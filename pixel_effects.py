@@ -0,0 +1,92 @@
+import numpy as np
+import pygame
+
+
+class PixelEffects:
+    """Tint, zoom and fade applied to surfaces in place, reusing buffers between frames.
+
+    zoom() gathers pixels through nearest-neighbour index maps on a pixels2d view, giving the
+    same pixels as scaling the screen up with pygame.transform.scale and blitting it centred,
+    without allocating the up-to-4x scaled copy. fade() blits one cached black surface with a
+    per-frame alpha. The buffers are rebuilt only when the screen size changes. zoom() with a
+    resolution below 1 works on a reduced copy and scales it back up, trading sharpness for
+    time when frames run over budget. tint() multiplies through a cached overlay that only
+    grows, so no surface is created per frame.
+    """
+
+    def __init__(self):
+        self.size = None
+        self.rows_buffer = None
+        self.gather_buffer = None
+        self.black = None
+        self.overlay = pygame.Surface((0, 0), pygame.SRCALPHA)
+        self.reduced = None
+        self.reduced_effects = None
+
+    def prepare(self, surface):
+        size = surface.get_size()
+        if size != self.size:
+            width, height = size
+            self.size = size
+            self.columns = np.arange(width, dtype=np.intp)
+            self.rows = np.arange(height, dtype=np.intp)
+            self.rows_buffer = np.empty((height, width), dtype=np.uint32)
+            self.gather_buffer = np.empty((height, width), dtype=np.uint32)
+            self.black = None
+            self.reduced = None
+
+    def index_maps(self, scale):
+        # Source row and column for every screen pixel, matching transform.scale's mapping
+        # (dst * src_size // scaled_size) shifted by the centring offset
+        width, height = self.size
+        scaled_width, scaled_height = int(width * scale), int(height * scale)
+        columns = (self.columns + int(width * (scale - 1) / 2)) * width // scaled_width
+        rows = (self.rows + int(height * (scale - 1) / 2)) * height // scaled_height
+        return np.minimum(columns, width - 1), np.minimum(rows, height - 1)
+
+    def zoom(self, surface, scale, resolution=1.0):
+        self.prepare(surface)
+        if resolution < 1.0:
+            size = (max(1, int(self.size[0] * resolution)), max(1, int(self.size[1] * resolution)))
+            if self.reduced is None or self.reduced.get_size() != size:
+                self.reduced = pygame.Surface(size).convert(surface)
+                self.reduced_effects = PixelEffects()
+            pygame.transform.scale(surface, size, self.reduced)
+            self.reduced_effects.zoom(self.reduced, scale)
+            pygame.transform.scale(self.reduced, self.size, surface)
+            return
+
+        if surface.get_bytesize() == 4:
+            view = pygame.surfarray.pixels2d(surface).T
+            if view.flags.c_contiguous:
+                columns, rows = self.index_maps(scale)
+                # Each source row is widened once, then copied to every screen row that shows it
+                source_rows, repeat = np.unique(rows, return_inverse=True)
+                count = len(source_rows)
+                np.take(view, source_rows, axis=0, out=self.rows_buffer[:count])
+                np.take(self.rows_buffer[:count], columns, axis=1, out=self.gather_buffer[:count])
+                np.take(self.gather_buffer[:count], repeat, axis=0, out=view)
+                return
+            del view
+
+        width, height = self.size
+        scaled = pygame.transform.scale(surface, (int(width * scale), int(height * scale)))
+        surface.blit(scaled, (-int(width * (scale - 1) / 2), -int(height * (scale - 1) / 2)))
+
+    def fade(self, surface, alpha):
+        self.prepare(surface)
+        if self.black is None:
+            self.black = pygame.Surface(self.size).convert(surface)
+        self.black.set_alpha(alpha)
+        surface.blit(self.black, (0, 0))
+
+    def tint(self, surface, rgba):
+        # Same pixels as blitting a filled SRCALPHA surface with BLEND_RGBA_MULT; that blit is
+        # SIMD-accelerated where fill() with the same flag is not
+        width, height = surface.get_size()
+        if width > self.overlay.get_width() or height > self.overlay.get_height():
+            self.overlay = pygame.Surface((max(width, self.overlay.get_width()),
+                                           max(height, self.overlay.get_height())), pygame.SRCALPHA)
+        area = pygame.Rect(0, 0, width, height)
+        self.overlay.fill(rgba, area)
+        surface.blit(self.overlay, (0, 0), area, special_flags=pygame.BLEND_RGBA_MULT)
@@ -0,0 +1,87 @@
+from collections import deque
+
+
+class QualityGovernor:
+    """Lowers effect quality while frames run over budget and raises it again once there is headroom.
+
+    Quality goes from 0.0 (cheapest) to 1.0 (full). Each knob maps it linearly onto its
+    (cheapest, full) bounds, and int bounds give rounded ints. Call frame() with the time spent
+    drawing each frame, excluding the clock.tick sleep. The governor averages the last `window`
+    frames. Above `high` of the budget it steps down. Below `low` for `recover_frames` frames in
+    a row it steps up. It stays within [min_quality, max_quality] and logs every change.
+    pin() fixes the quality, which offline renders need so a frame always gets the same effects.
+    Only the effects change, never the clock, so lyric timing is unaffected.
+    """
+
+    def __init__(self, knobs, budget_ms=1000 / 60, min_quality=0.0, max_quality=1.0, step=0.25,
+                 window=30, high=0.9, low=0.6, recover_frames=120, log=print):
+        self.knobs = dict(knobs)
+        self.budget = budget_ms / 1000
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.step = step
+        self.high = high
+        self.low = low
+        self.recover_frames = recover_frames
+        self.log = log
+        self.quality = max_quality
+        self.pinned = False
+        self.samples = deque(maxlen=window)
+        self.calm_frames = 0
+        self.frames = 0
+        self.changes = []  # (frame, old quality, new quality, average draw ms)
+        self.frames_at = {}
+
+    def value(self, name, quality=None):
+        quality = self.quality if quality is None else quality
+        cheapest, full = self.knobs[name]
+        value = cheapest + (full - cheapest) * quality
+        if isinstance(cheapest, int) and isinstance(full, int):
+            return int(round(value))
+        return value
+
+    def pin(self, quality):
+        self.set_quality(min(max(quality, 0.0), 1.0), reason="pinned")
+        self.pinned = True
+
+    def unpin(self):
+        self.pinned = False
+
+    def set_quality(self, quality, reason, average=None):
+        if quality == self.quality:
+            return
+        self.changes.append((self.frames, self.quality, quality, None if average is None else average * 1000))
+        detail = f", draw {average * 1000:.1f} ms of {self.budget * 1000:.1f} ms" if average is not None else ""
+        self.log(f"Quality {self.quality:.2f} -> {quality:.2f} ({reason}{detail}): {self.describe_knobs(quality)}")
+        self.quality = quality
+        self.samples.clear()
+        self.calm_frames = 0
+
+    def frame(self, seconds):
+        self.frames += 1
+        self.frames_at[self.quality] = self.frames_at.get(self.quality, 0) + 1
+        if self.pinned:
+            return
+        self.samples.append(seconds)
+        if len(self.samples) < self.samples.maxlen:
+            return
+        average = sum(self.samples) / len(self.samples)
+        if average > self.budget * self.high and self.quality > self.min_quality:
+            self.set_quality(max(self.min_quality, self.quality - self.step), "over budget", average)
+        elif average < self.budget * self.low:
+            self.calm_frames += 1
+            if self.calm_frames >= self.recover_frames and self.quality < self.max_quality:
+                self.set_quality(min(self.max_quality, self.quality + self.step), "headroom", average)
+        else:
+            self.calm_frames = 0
+
+    def describe_knobs(self, quality=None):
+        return ', '.join(f"{name} {self.value(name, quality):g}" for name in self.knobs)
+
+    def describe(self):
+        if not self.frames:
+            return "Quality: no frames drawn"
+        mode = "pinned" if self.pinned else f"adaptive {self.min_quality:.2f}-{self.max_quality:.2f}"
+        spread = ', '.join(f"{quality:.2f}: {100 * count / self.frames:.0f}%"
+                           for quality, count in sorted(self.frames_at.items(), reverse=True))
+        return f"Quality ({mode}): {len(self.changes)} change(s) over {self.frames} frames, frames at {spread}"
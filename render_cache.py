@@ -0,0 +1,239 @@
+import ast
+import hashlib
+import inspect
+import os
+import shutil
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from audio_analysis import file_hash
+
+# Disk space for cached frames: about 75 seconds of the copy script's 720p60 (3.5 MB a frame)
+DEFAULT_RENDER_CACHE_MB = 16 * 1024
+# Memory for drawn text layers before the least recently used are dropped or spilled to disk
+DEFAULT_LAYER_CACHE_MB = 256
+
+
+def cache_key(*parts):
+    # Inputs that fully determine a frame, reduced to a file-name-safe digest
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def local_imports(module, paths=None):
+    # Files of the modules next to this one that it uses, directly or through each other
+    paths = set() if paths is None else paths
+    directory = os.path.dirname(os.path.abspath(module.__file__))
+    for value in vars(module).values():
+        source = value if inspect.ismodule(value) else sys.modules.get(getattr(value, '__module__', None) or '')
+        path = getattr(source, '__file__', None)
+        if (source is not module and path and path.endswith('.py')
+                and os.path.dirname(os.path.abspath(path)) == directory and os.path.abspath(path) not in paths):
+            paths.add(os.path.abspath(path))
+            local_imports(source, paths)
+    return paths
+
+
+def script_source(module, masked=('lyrics',)):
+    # The script's source with the statements assigning the masked names blanked out
+    with open(module.__file__, encoding='utf-8') as f:
+        source = f.read()
+    lines = source.splitlines(keepends=True)
+    for node in ast.parse(source).body:
+        targets = node.targets if isinstance(node, ast.Assign) else [getattr(node, 'target', None)]
+        if isinstance(node, (ast.Assign, ast.AnnAssign)) and any(
+                isinstance(target, ast.Name) and target.id in masked for target in targets):
+            for line in range(node.lineno - 1, node.end_lineno):
+                lines[line] = '\n'
+    return ''.join(lines)
+
+
+def scene_fingerprint(module, files=(), masked=('lyrics',)):
+    """Digest of the code, constants and input files a script's frames depend on.
+
+    Covers every local module the script imported, the script's whole source (any visual
+    edit, down to a particle palette, changes it) and the content of files (audio, images).
+    The script's lyric list is masked out of its source by default: frame keys carry the
+    lyric state, so editing one line only changes the frames showing it.
+    """
+    digest = hashlib.sha1()
+    for path in sorted(local_imports(module)):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    digest.update(script_source(module, masked).encode('utf-8'))
+    for path in files:
+        if os.path.exists(path):
+            digest.update(file_hash(path).encode('ascii'))
+        else:
+            digest.update(f"missing {path}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Finished frames keyed by their deterministic inputs, kept on disk between renders.
+
+    put() writes a frame to directory as a raw RGBX file; get() memory-maps it, so a later
+    render of the same song skips drawing every frame whose inputs did not change. Frame keys
+    include the frame index (it seeds the lights and particles), so whole frames are only
+    reused across renders; within one, a repeated chorus reuses its text through a LayerLRU,
+    which spills the layers it drops here as RGBA files. The directory is kept under
+    budget_mb (and the disk's free space) after every write by dropping the least recently
+    used files. A process rescans the directory when it goes over, so parallel workers
+    sharing it also keep to the budget, and trims to 90% of it so rescans stay rare.
+    """
+
+    def __init__(self, directory, budget_mb=DEFAULT_RENDER_CACHE_MB):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = self.scan()
+        self.bytes_used = sum(self.files.values())
+        # Never plan on more than the disk can hold next to what is already cached
+        free = shutil.disk_usage(directory).free
+        self.budget = int(min(budget_mb * 1024 * 1024, self.bytes_used + free * 0.9))
+        self.stats = {'hits': 0, 'misses': 0, 'written': 0, 'evicted': 0}
+        self.trim()
+
+    def scan(self):
+        # Cached frames by path, least recently used first
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(('.rgbx', '.rgba')):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another worker
+                files.append((stat.st_mtime, path, stat.st_size))
+        return OrderedDict((path, size) for _, path, size in sorted(files))
+
+    def path_for(self, key, size, pixel_format='RGBX'):
+        return os.path.join(self.directory, f"{key}_{size[0]}x{size[1]}.{pixel_format.lower()}")
+
+    def get(self, key, size):
+        surface = self.load(key, size)
+        self.stats['hits' if surface is not None else 'misses'] += 1
+        return surface
+
+    def put(self, key, surface):
+        self.store(key, surface)
+        self.stats['written'] += 1
+
+    def load(self, key, size, pixel_format='RGBX'):
+        path = self.path_for(key, size, pixel_format)
+        if os.path.exists(path) and os.path.getsize(path) == size[0] * size[1] * 4:
+            # Mapped, not read: the surface shares the file's pages and is only good for
+            # blitting right away
+            pixels = np.memmap(path, dtype=np.uint8, mode='r')
+            os.utime(path)  # most recently used, for trimming
+            if path in self.files:
+                self.files.move_to_end(path)
+            return pygame.image.frombuffer(pixels, size, pixel_format)
+        return None
+
+    def store(self, key, surface, pixel_format='RGBX'):
+        path = self.path_for(key, surface.get_size(), pixel_format)
+        # Write then rename so parallel render workers never map a half-written frame
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(pygame.image.tobytes(surface, pixel_format))
+        os.replace(temporary, path)
+        size = surface.get_width() * surface.get_height() * 4
+        self.bytes_used += size - self.files.pop(path, 0)
+        self.files[path] = size
+        if self.bytes_used > self.budget:
+            self.trim()
+
+    def trim(self):
+        if self.bytes_used <= self.budget:
+            return
+        # Other workers may have written or removed files since the last look
+        self.files = self.scan()
+        self.bytes_used = sum(self.files.values())
+        target = self.budget * 0.9
+        while self.bytes_used > target and len(self.files) > 1:
+            path, size = self.files.popitem(last=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.bytes_used -= size
+            self.stats['evicted'] += 1
+
+    def describe(self):
+        stats = self.stats
+        lookups = stats['hits'] + stats['misses']
+        hit_rate = stats['hits'] / lookups if lookups else 0.0
+        return (f"Render cache: {stats['hits']}/{lookups} frames reused ({hit_rate:.1%}), {stats['written']} written, "
+                f"{stats['evicted']} evicted, {len(self.files)} files / {self.bytes_used / (1024 * 1024):.0f} MB "
+                f"on disk of a {self.budget / (1024 * 1024):.0f} MB budget")
+
+
+class LayerLRU:
+    """Drawn layers keyed by the state that fixes their pixels, within a memory budget.
+
+    get() returns the layer for key, calling draw(surface) on a new transparent surface of
+    size only the first time that state comes up, so a repeated chorus is drawn once. The
+    least recently used layers beyond budget_mb are dropped, or with a spill RenderCache
+    written to its directory and mapped back when they come up again; spill keys add the
+    scene fingerprint, as the files outlive the process.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_LAYER_CACHE_MB):
+        self.budget = budget_mb * 1024 * 1024
+        self.layers = OrderedDict()
+        self.bytes_used = 0
+        self.spill = None
+        self.fingerprint = None
+        self.stats = {'hits': 0, 'misses': 0, 'spilled': 0, 'mapped': 0}
+
+    def spill_to(self, cache, fingerprint):
+        self.spill = cache
+        self.fingerprint = fingerprint
+
+    def spill_key(self, key, size):
+        return cache_key(self.fingerprint, key, tuple(size))
+
+    def get(self, key, size, draw):
+        layer = self.layers.get((key, tuple(size)))
+        if layer is not None:
+            self.layers.move_to_end((key, tuple(size)))
+            self.stats['hits'] += 1
+            return layer
+        if self.spill is not None:
+            layer = self.spill.load(self.spill_key(key, size), size, 'RGBA')
+            if layer is not None:
+                self.stats['mapped'] += 1
+                # Copied out of the mapping, as another worker may trim the file
+                return self.put(key, layer.copy())
+        self.stats['misses'] += 1
+        layer = pygame.Surface(size, pygame.SRCALPHA)
+        draw(layer)
+        return self.put(key, layer)
+
+    def put(self, key, layer):
+        size = layer.get_size()
+        self.layers[(key, size)] = layer
+        self.bytes_used += size[0] * size[1] * 4
+        while self.bytes_used > self.budget and len(self.layers) > 1:
+            (old_key, old_size), old = self.layers.popitem(last=False)
+            self.bytes_used -= old_size[0] * old_size[1] * 4
+            if self.spill is not None and not os.path.exists(
+                    self.spill.path_for(self.spill_key(old_key, old_size), old_size, 'RGBA')):
+                self.spill.store(self.spill_key(old_key, old_size), old, 'RGBA')
+                self.stats['spilled'] += 1
+        return layer
+
+    def clear(self):
+        self.layers.clear()
+        self.bytes_used = 0
+
+    def describe(self):
+        stats = self.stats
+        lookups = stats['hits'] + stats['mapped'] + stats['misses']
+        reused = stats['hits'] + stats['mapped']
+        hit_rate = reused / lookups if lookups else 0.0
+        return (f"Layer cache: {reused}/{lookups} layers reused ({hit_rate:.1%}, {stats['mapped']} from disk), "
+                f"{stats['spilled']} spilled, {len(self.layers)} layers / {self.bytes_used / (1024 * 1024):.0f} MB "
+                f"in memory of a {self.budget / (1024 * 1024):.0f} MB budget")
@@ -0,0 +1,66 @@
+import argparse
+from collections import namedtuple
+
+# size is what gets written out; frames are drawn at size * supersample and resampled to it,
+# smoothed down when above 1 (anti-aliased delivery) and scaled up when below (fast previews)
+RenderProfile = namedtuple('RenderProfile', 'name size supersample')
+
+RENDER_PROFILES = {profile.name: profile for profile in (
+    RenderProfile('draft', (854, 480), 1),
+    RenderProfile('preview-1080p', (1920, 1080), 0.5),
+    RenderProfile('720p', (1280, 720), 1),
+    RenderProfile('1080p', (1920, 1080), 1),
+    RenderProfile('1080p-ss', (1920, 1080), 2),
+    RenderProfile('4k', (3840, 2160), 1),
+    RenderProfile('vertical', (1080, 1920), 1),
+)}
+
+
+def draw_size(profile):
+    width, height = profile.size
+    return max(1, int(round(width * profile.supersample))), max(1, int(round(height * profile.supersample)))
+
+
+def resolve_profile(value):
+    # A profile name, or WIDTHxHEIGHT for a plain size
+    if isinstance(value, RenderProfile):
+        return value
+    if isinstance(value, str):
+        if value.lower() in RENDER_PROFILES:
+            return RENDER_PROFILES[value.lower()]
+        try:
+            width, height = (int(part) for part in value.lower().split('x'))
+        except ValueError:
+            # Also the argparse type of --resolution, which only shows this exception type's message
+            raise argparse.ArgumentTypeError(f"unknown render profile '{value}'; use one of "
+                                             f"{', '.join(RENDER_PROFILES)} or WIDTHxHEIGHT")
+        return RenderProfile(f"{width}x{height}", (width, height), 1)
+    width, height = value
+    return RenderProfile(f"{width}x{height}", (int(width), int(height)), 1)
+
+
+class SceneScale:
+    """Maps a script's design pixels onto the size it is drawn at.
+
+    Each script lays out its scene at a design size. Lengths (font sizes, line widths,
+    offsets, speeds in pixels per second) are scaled by the smaller of the two axis ratios,
+    so the scene keeps its proportions and fits at any aspect ratio; positions tied to the
+    screen edges or centre use WIDTH and HEIGHT directly. At the design size every value is
+    returned unchanged, so those frames are exactly what the unscaled code drew.
+    """
+
+    def __init__(self, design_size):
+        self.design_size = tuple(design_size)
+        self.resize(design_size)
+
+    def resize(self, size):
+        self.factor = min(size[0] / self.design_size[0], size[1] / self.design_size[1])
+
+    def __call__(self, value):
+        if self.factor == 1:
+            return value
+        if isinstance(value, int):
+            scaled = int(round(value * self.factor))
+            # A thin line or a small offset shrinks to one pixel rather than vanishing
+            return scaled if scaled or not value else (1 if value > 0 else -1)
+        return value * self.factor
@@ -0,0 +1,101 @@
+import time
+
+import pygame
+
+from audio_analysis import file_hash, load_cues
+
+
+class Renderer:
+    """Display, mixer and song of a lyric script, set up on first use instead of at import.
+
+    Importing a script only creates this object. The window (or headless surface) opens and
+    the song is loaded when screen is first read, the audio analysis when cues is first read
+    and the audio file is only parsed for its length when duration is needed and none was given.
+    Startup is timed from construction to the first frame_drawn() call.
+    """
+
+    def __init__(self, size, caption, audio_path, duration=None):
+        self.size = tuple(size)
+        self.caption = caption
+        self.audio_path = audio_path
+        self.fixed_duration = duration
+        self.created = time.perf_counter()
+        self._screen = None
+        self._cues = None
+        self._duration = None
+        self._audio_hash = None
+        self.setup_seconds = None
+        self.first_frame_seconds = None
+
+    @property
+    def started(self):
+        return self._screen is not None
+
+    def start(self):
+        if self._screen is None:
+            start = time.perf_counter()
+            pygame.init()
+            pygame.mixer.init()
+            self._screen = pygame.display.set_mode(self.size)
+            pygame.display.set_caption(self.caption)
+            pygame.mixer.music.load(self.audio_path)
+            self.setup_seconds = time.perf_counter() - start
+        return self._screen
+
+    @property
+    def screen(self):
+        return self.start()
+
+    @property
+    def cues(self):
+        return self.load_cues()
+
+    def load_cues(self):
+        # Onsets, beats and energy from the offline analysis (cached next to the audio file)
+        if self._cues is None:
+            self._cues = load_cues(self.audio_path, audio_hash=self.audio_hash)
+        return self._cues
+
+    @property
+    def duration(self):
+        if self.fixed_duration is not None:
+            return self.fixed_duration
+        if self._duration is None:
+            # mutagen only reads the headers (MP3, WAV, FLAC, ...); imported here so scripts that never
+            # need it skip it
+            import mutagen
+            self._duration = mutagen.File(self.audio_path).info.length
+        return self._duration
+
+    @property
+    def audio_hash(self):
+        # Hashed once per song: long mixes take a while to read
+        if self._audio_hash is None:
+            self._audio_hash = file_hash(self.audio_path)
+        return self._audio_hash
+
+    def set_resolution(self, size):
+        self.size = tuple(size)
+        if self._screen is not None:
+            self._screen = pygame.display.set_mode(self.size)
+
+    def load_song(self, audio_path, duration=None):
+        # Switch to another track; its cues and length are looked up again on first use
+        self.audio_path = audio_path
+        self.fixed_duration = duration
+        self._cues = None
+        self._duration = None
+        self._audio_hash = None
+        if self._screen is not None:
+            pygame.mixer.music.load(audio_path)
+
+    def frame_drawn(self):
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = time.perf_counter() - self.created
+
+    def describe_startup(self):
+        if self.first_frame_seconds is None:
+            return "Startup: no frame drawn"
+        setup = f"{self.setup_seconds * 1000:.0f} ms" if self.setup_seconds is not None else "not needed"
+        return (f"Startup: first frame {self.first_frame_seconds * 1000:.0f} ms after the script loaded "
+                f"(display, mixer and song setup {setup})")
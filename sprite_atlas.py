@@ -0,0 +1,59 @@
+from collections import OrderedDict
+
+import pygame
+
+
+class SpriteAtlas:
+    """Rotated and scaled variants of named images, filled lazily on first use.
+
+    Angles are quantized to angle_step degrees; scaled variants are keyed by their exact
+    pixel size. Variants are kept in display format and evicted least-recently-used once
+    their pixel data exceeds budget_bytes.
+    """
+
+    def __init__(self, images, angle_step=1.0, budget_bytes=128 * 1024 * 1024):
+        self.images = images
+        self.angle_step = angle_step
+        self.budget_bytes = budget_bytes
+        self.variants = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, build):
+        surface = self.variants.get(key)
+        if surface is not None:
+            self.variants.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = build().convert_alpha()
+        self.variants[key] = surface
+        self.bytes_used += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        while self.bytes_used > self.budget_bytes and len(self.variants) > 1:
+            _, evicted = self.variants.popitem(last=False)
+            self.bytes_used -= evicted.get_width() * evicted.get_height() * evicted.get_bytesize()
+        return surface
+
+    def quantize_angle(self, angle):
+        return round(angle / self.angle_step) * self.angle_step % 360
+
+    def rotate(self, name, angle):
+        angle = self.quantize_angle(angle)
+        return self._lookup((name, 'rotate', angle),
+                            lambda: pygame.transform.rotate(self.images[name], angle))
+
+    def scale(self, name, size):
+        size = (max(0, int(size[0])), max(0, int(size[1])))
+        return self._lookup((name, 'scale', size),
+                            lambda: pygame.transform.scale(self.images[name], size))
+
+    def clear(self):
+        self.variants.clear()
+        self.bytes_used = 0
+
+    def describe(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (f"Sprite atlas: {self.hits} hits / {self.misses} misses ({hit_rate:.1%} hit rate), "
+                f"{len(self.variants)} variants, {self.bytes_used / (1024 * 1024):.1f} MB")
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+
+import pygame
+
+from glyph_layout import GlyphMetrics
+
+
+class LRUCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return value
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class TextCache:
+    """Caches Font objects, rendered text surfaces, glyph layouts and fit-to-width font sizes.
+
+    Surfaces handed out are shared between callers, so blit or copy them but never draw on them.
+    """
+
+    def __init__(self, max_surfaces=256, max_fonts=32):
+        self.fonts = LRUCache(max_fonts)
+        self.surfaces = LRUCache(max_surfaces)
+        self.layouts = LRUCache(max_surfaces)
+        self.glyph_metrics = {}
+        self.fit_sizes = {}
+
+    def font(self, size, font_path=None):
+        key = (font_path, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                # Scripts no longer initialise pygame at import, so text may be rendered first
+                pygame.font.init()
+            font = self.fonts.put(key, pygame.font.Font(font_path, size))
+        return font
+
+    def render(self, text, size, color, font_path=None, antialias=True):
+        key = (text, size, tuple(color), font_path, antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.font(size, font_path).render(text, antialias, color)
+            surface = self.surfaces.put(key, surface)
+        return surface
+
+    def metrics(self, size, font_path=None):
+        key = (font_path, size)
+        metrics = self.glyph_metrics.get(key)
+        if metrics is None:
+            metrics = self.glyph_metrics[key] = GlyphMetrics(self.font(size, font_path))
+        return metrics
+
+    def layout(self, text, size, font_path=None):
+        key = (text, size, font_path)
+        layout = self.layouts.get(key)
+        if layout is None:
+            layout = self.layouts.put(key, self.metrics(size, font_path).layout(text))
+        return layout
+
+    def fit_size(self, text, max_width, max_size, font_path=None):
+        # Largest size (down to 1) whose rendered width fits, found by binary search
+        key = (text, max_width, max_size, font_path)
+        size = self.fit_sizes.get(key)
+        if size is not None:
+            return size
+        low, high = 1, max_size
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.font(middle, font_path).size(text)[0] <= max_width:
+                low = middle
+            else:
+                high = middle - 1
+        self.fit_sizes[key] = low
+        return low
+
+    def stats(self):
+        return {
+            'surface_hits': self.surfaces.hits,
+            'surface_misses': self.surfaces.misses,
+            'font_hits': self.fonts.hits,
+            'font_misses': self.fonts.misses,
+            'surfaces': len(self.surfaces),
+            'fonts': len(self.fonts),
+        }
+
+    def describe(self):
+        stats = self.stats()
+        lookups = stats['surface_hits'] + stats['surface_misses']
+        hit_rate = stats['surface_hits'] / lookups if lookups else 0.0
+        return (f"Text cache: {stats['surface_hits']} hits / {stats['surface_misses']} misses "
+                f"({hit_rate:.1%} hit rate), {stats['surfaces']} surfaces, "
+                f"{stats['font_misses']} fonts created")